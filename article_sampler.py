@@ -0,0 +1,131 @@
+"""Random article sampling without ORDER BY RANDOM() over the whole table.
+
+ORDER BY RANDOM() scores and sorts every row that passes the filters. Article
+ids are allocated in insertion order instead, so the sampler draws candidate
+ids uniformly from the id range of the recency window and looks them up by
+primary key; ids that were deleted or do not match the filters are rejected.
+Every matching article stays equally likely, and the cost depends on the
+sample size and the share of matching rows rather than the archive size.
+"""
+import math
+import random
+import sqlite3
+from typing import List, Sequence
+
+import news_db
+
+WINDOW_START_SQL = "SELECT id FROM articles WHERE created_epoch >= ? ORDER BY created_epoch LIMIT 1"
+# NOT INDEXED: look the candidates up by rowid, never by walking the category index
+LOOKUP_SQL = "SELECT a.id FROM articles a NOT INDEXED {join} WHERE a.id IN ({placeholders}) AND {where}"
+EXACT_SQL = "SELECT a.id FROM articles a {join} WHERE {where} ORDER BY RANDOM() LIMIT ?"
+
+
+class ArticleSampler:
+    """Draws distinct random article ids, optionally within a recency window and category
+
+    When fewer than `exact_below` articles are expected to match (small
+    archives, narrow windows), when matches are too rare to find in a few
+    batches (rare categories), or when candidate lookups keep missing, the
+    matching rows are read through the category/created_epoch indexes
+    (migrations.ARTICLE_INDEXES) and shuffled exactly instead. Candidates are
+    looked up in batches of at most `batch_limit` ids, for at most
+    `max_rounds` rounds.
+    """
+
+    def __init__(self, exact_below: int = 2000, batch_limit: int = 500, max_rounds: int = 6, rng=None):
+        self.exact_below = exact_below
+        self.batch_limit = batch_limit
+        self.max_rounds = max_rounds
+        self.rng = rng or random.SystemRandom()
+
+    def filters(self, since: int, category: str, unique: bool):
+        """(join, where, params) for the window, category and near-duplicate filters"""
+        join, conditions, params = "", [], []
+        if since is not None:
+            conditions.append("a.created_epoch >= ?")
+            params.append(since)
+        if category is not None:
+            conditions.append("a.category = ?")
+            params.append(category)
+        if unique:
+            # only the first-seen article of each near-duplicate cluster
+            join = news_db.UNIQUE_ARTICLES_JOIN
+            conditions.append(news_db.UNIQUE_ARTICLES_WHERE)
+        return join, ' AND '.join(conditions) or '1', params
+
+    def _id_range(self, cursor, since: int):
+        # Two queries: SQLite only answers MIN/MAX from the index when each stands alone
+        cursor.execute("SELECT MAX(id) FROM articles")
+        hi = cursor.fetchone()[0]
+        if since is None:
+            cursor.execute("SELECT MIN(id) FROM articles")
+        else:
+            # ids follow created_epoch, so the first article of the window starts its id range
+            cursor.execute(WINDOW_START_SQL, (since,))
+        row = cursor.fetchone()
+        return (row[0], hi) if row and row[0] is not None else (None, None)
+
+    def _category_share(self, cursor, category: str) -> float:
+        """Fraction of all articles in the category, from the statistics counters"""
+        if category is None:
+            return 1.0
+        try:
+            cursor.execute("SELECT articles FROM article_category_counts WHERE category = ?", (category,))
+            row = cursor.fetchone()
+            cursor.execute("SELECT total_articles FROM article_stats WHERE id = 1")
+            total = cursor.fetchone()
+        except sqlite3.OperationalError:
+            return 1.0  # database predates the statistics counters
+        return row[0] / total[0] if row and total and total[0] else 0.0
+
+    def _by_id_lookup(self, cursor, limit: int, lo: int, hi: int, share: float, filters) -> List[int]:
+        join, where, params = filters
+        span = hi - lo + 1
+        hit_rate = max(share, 0.01)
+        tried, found = set(), []
+        for _ in range(self.max_rounds):
+            needed = limit - len(found)
+            if needed <= 0 or len(tried) >= span:
+                break
+            size = min(self.batch_limit, span - len(tried), math.ceil(needed / hit_rate * 1.5) + 4)
+            candidates = set()
+            while len(candidates) < size:
+                candidate = self.rng.randint(lo, hi)
+                if candidate not in tried:
+                    candidates.add(candidate)
+            tried |= candidates
+
+            placeholders = ','.join('?' * len(candidates))
+            cursor.execute(LOOKUP_SQL.format(join=join, placeholders=placeholders, where=where),
+                           [*candidates, *params])
+            hits = [row[0] for row in cursor.fetchall()]
+            found.extend(self.rng.sample(hits, min(needed, len(hits))))
+            hit_rate = max(len(hits) / size, hit_rate / 4, 0.001)
+        return found
+
+    def sample(self, cursor, limit: int, since: int = None, category: str = None, unique: bool = False) -> List[int]:
+        """Up to `limit` distinct random article ids created at or after `since` (epoch seconds), in random order"""
+        lo, hi = self._id_range(cursor, since)
+        if lo is None or limit <= 0:
+            return []
+
+        filters = self.filters(since, category, unique)
+        share = self._category_share(cursor, category)
+        # Lookups pay off when many rows match and hits are common enough to find in a few batches
+        if (hi - lo + 1) * share > self.exact_below and limit * 2 <= share * self.batch_limit * self.max_rounds:
+            ids = self._by_id_lookup(cursor, limit, lo, hi, share, filters)
+            if len(ids) >= limit:
+                return ids
+
+        join, where, params = filters
+        cursor.execute(EXACT_SQL.format(join=join, where=where), [*params, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+    def fetch(self, cursor, ids: Sequence[int], columns: str) -> List[tuple]:
+        """SELECT `columns` (starting with a.id) FROM articles a for the sampled ids, in the sample's order"""
+        if not ids:
+            return []
+        placeholders = ','.join('?' * len(ids))
+        cursor.execute(f"SELECT {columns} FROM articles a WHERE a.id IN ({placeholders})", list(ids))
+        rows = {row[0]: row for row in cursor.fetchall()}
+        return [rows[article_id] for article_id in ids if article_id in rows]
@@ -0,0 +1,758 @@
+"""Performance benchmarks for the Nigerian news ingestion pipeline.
+
+Run all benchmarks:      python benchmarks.py
+Run a single benchmark:  python benchmarks.py feeds
+
+Benchmarks run in a temporary directory against a local fake feed server,
+so they never touch the real database or hit the real news sites.
+"""
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+NEWS_WORDS = (
+    'lagos abuja kano ibadan enugu port harcourt governor senate assembly minister police army naira '
+    'inflation fuel subsidy price market traders farmers students strike union court judge election '
+    'party campaign votes eagles league coach striker transfer match goal nollywood actor album concert '
+    'festival flood rain road bridge hospital doctors power grid oil refinery bank loan budget tax'
+).split()
+
+
+def make_rss(title: str, count: int, link_prefix: str = 'https://example.ng/story',
+             image_base: str = None) -> bytes:
+    """Build a small RSS 2.0 document with `count` items, each with its own random-word summary"""
+    import random
+
+    items = []
+    slug = title.lower().replace(' ', '-')
+    for i in range(count):
+        enclosure = f'<enclosure url="{image_base}/{slug}-{i}.jpg" type="image/jpeg"/>' if image_base else ''
+        items.append(f"""
+        <item>
+            <title>{title} story {i}</title>
+            <link>{link_prefix}/{slug}/{i}</link>
+            <description>{' '.join(random.Random(f'{title}-{i}').choices(NEWS_WORDS, k=30))}</description>
+            <pubDate>{formatdate(time.time() - i * 600)}</pubDate>
+            {enclosure}
+        </item>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>{title}</title>{''.join(items)}
+</channel></rss>""".encode()
+
+
+class FakeFeedServer:
+    """Local HTTP server that serves RSS feeds after an artificial delay
+
+    Feeds carry an ETag and answer 304 Not Modified when it is replayed.
+    Paths under /trickle/ send a valid start of a feed, then one byte every
+    half second for a minute.
+    """
+
+    def __init__(self, latency: float = 0.3, items_per_feed: int = 20,
+                 with_images: bool = False, image_latency: float = 0.1, image_size=(1600, 1067)):
+        self.latency = latency
+        self.items_per_feed = items_per_feed
+        self.with_images = with_images
+        self.image_latency = image_latency
+        self.image_size = image_size
+        self._image_bytes = None
+        self._image_lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/img/'):
+                    time.sleep(server.image_latency)
+                    body = server.image_bytes()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'image/jpeg')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                if self.path.startswith('/trickle/'):
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/rss+xml')
+                    self.end_headers()
+                    body = make_rss('Trickle', 50)
+                    try:
+                        for i in range(120):
+                            self.wfile.write(body[i:i + 1])
+                            self.wfile.flush()
+                            time.sleep(0.5)
+                    except OSError:
+                        pass  # the client gave up
+                    return
+
+                time.sleep(server.latency)
+                etag = f'"{server.items_per_feed}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                image_base = f"http://{self.headers['Host']}/img" if server.with_images else None
+                body = make_rss(self.path.strip('/').replace('/', ' '), server.items_per_feed,
+                                image_base=image_base)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/rss+xml')
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('0.0.0.0', 0), Handler)
+        self.port = self.httpd.server_address[1]
+
+    def image_bytes(self) -> bytes:
+        """A noisy JPEG photo of `image_size`, generated once"""
+        with self._image_lock:
+            if self._image_bytes is None:
+                from PIL import Image
+
+                image = Image.effect_noise(self.image_size, 64).convert('RGB')
+                buffer = io.BytesIO()
+                image.save(buffer, 'JPEG', quality=90)
+                self._image_bytes = buffer.getvalue()
+        return self._image_bytes
+
+    def feeds(self, count: int):
+        """One feed per loopback address so each counts as a separate host"""
+        categories = ['nigeria', 'sports', 'entertainment']
+        return [(f"http://127.0.0.{i + 1}:{self.port}/feed{i}", categories[i % 3])
+                for i in range(count)]
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@contextmanager
+def scratch_app():
+    """A NigerianNewsBlogWithImages instance living in a temporary directory"""
+    from nigerian_news_with_images import NigerianNewsBlogWithImages
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            yield NigerianNewsBlogWithImages()
+        finally:
+            os.chdir(cwd)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def fetch_feeds(blog, feeds, concurrent: bool = True):
+    """Every article of the feeds, fetched and parsed but not stored (validators and watermarks stay pending)"""
+    return [article for _, _, articles in blog.stream_feeds(feeds, concurrent) for article in articles]
+
+
+def benchmark_feed_fetching(feed_count: int = 14, latency: float = 0.3):
+    """Serial fetch loop vs concurrent fetch engine for one cycle"""
+    print(f"\n📡 Feed fetching: {feed_count} feeds, {latency * 1000:.0f}ms latency each")
+    with FakeFeedServer(latency) as server:
+        feeds = server.feeds(feed_count)
+        # Separate scratch apps so the second run does not get 304s
+        with scratch_app() as blog:
+            serial_time, serial = timed(fetch_feeds, blog, feeds, False)
+        with scratch_app() as blog:
+            concurrent_time, concurrent = timed(fetch_feeds, blog, feeds)
+
+    print(f"   serial:     {serial_time:6.2f}s  ({len(serial)} articles)")
+    print(f"   concurrent: {concurrent_time:6.2f}s  ({len(concurrent)} articles)")
+    print(f"   speedup:    {serial_time / concurrent_time:6.1f}x")
+
+
+def benchmark_conditional_get(feed_count: int = 14, items_per_feed: int = 100):
+    """Full download and parse vs replayed ETag (304 Not Modified)"""
+    print(f"\n🏷️  Conditional GET: {feed_count} feeds, {items_per_feed} items each")
+    with FakeFeedServer(0, items_per_feed) as server, scratch_app() as blog:
+        feeds = server.feeds(feed_count)
+        # Validators are only kept once a feed's articles are stored, so the first pass stores them
+        first_time, first = timed(lambda: sum(fetched for _, _, fetched, _ in
+                                              blog.ingest_feeds(blog.stream_feeds(feeds))))
+        second_time, second = timed(fetch_feeds, blog, feeds)
+
+    print(f"   first fetch:  {first_time:6.2f}s  ({first} articles, stored)")
+    print(f"   second fetch: {second_time:6.2f}s  ({len(second)} articles, all 304)")
+
+
+def benchmark_image_pipeline(feed_count: int = 4, items_per_feed: int = 10, image_latency: float = 0.2):
+    """Time until articles are committed vs until all images are done"""
+    print(f"\n📸 Image pipeline: {feed_count * items_per_feed} images, "
+          f"{image_latency * 1000:.0f}ms latency each")
+    with FakeFeedServer(0, items_per_feed, with_images=True, image_latency=image_latency) as server, \
+            scratch_app() as blog:
+        articles = fetch_feeds(blog, server.feeds(feed_count))
+        save_time, saved = timed(blog.save_articles, articles)
+        images_time, _ = timed(blog.image_pipeline.wait)
+        stats = blog.image_pipeline.stats()
+
+    print(f"   articles committed: {save_time:6.2f}s  ({len(saved)} rows)")
+    print(f"   images finished:    {save_time + images_time:6.2f}s  "
+          f"({stats['processed']} ok, {stats['failed']} failed, "
+          f"{stats['concurrency']} workers, peak queue {stats['max_queue_depth']})")
+
+
+def save_articles_per_row(db_name: str, articles):
+    """The original save loop: default journal, one execute per article, one commit"""
+    import sqlite3
+
+    conn = sqlite3.connect(db_name)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    cursor = conn.cursor()
+    for article in articles:
+        cursor.execute("""
+            INSERT OR IGNORE INTO articles 
+            (title, description, url, published_date, source, category, image_url, local_image_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            article['title'], article['description'], article['url'],
+            article['published_date'], article['source'], article['category'],
+            article.get('image_url'), 'images/fallbacks/news_default.jpg'
+        ))
+    conn.commit()
+    conn.close()
+
+
+def synthetic_articles(count: int, prefix: str = 'bench'):
+    """Article dicts as build_articles makes them, publish epoch included"""
+    categories = ['nigeria', 'sports', 'entertainment']
+    now = int(time.time())
+    return [{
+        'title': f'{prefix} headline {i}',
+        'description': 'Lagos, Abuja and Port Harcourt update. ' * 8,
+        'url': f'https://example.ng/{prefix}/{i}',
+        'published_date': formatdate(now - i * 60),
+        'published_epoch': now - i * 60,
+        'source': f'Source {i % 14}',
+        'category': categories[i % 3],
+        'image_url': None,
+    } for i in range(count)]
+
+
+def benchmark_bulk_writer(count: int = 20000):
+    """Original per-row insert loop vs chunked executemany writer in WAL mode
+
+    Only the insert is timed: save_articles adds near-duplicate indexing and
+    image queueing, which the per-row loop never did.
+    """
+    import news_db
+
+    print(f"\n💾 Bulk writer: {count} articles")
+    with scratch_app() as blog:
+        per_row_time, _ = timed(save_articles_per_row, blog.db_name, synthetic_articles(count, 'row'))
+        news_db.enable_wal(blog.db_name)
+        bulk_time, (saved, _) = timed(blog.insert_articles, synthetic_articles(count, 'bulk'))
+
+    print(f"   per-row loop:  {per_row_time:6.2f}s  ({count / per_row_time:,.0f} rows/s)")
+    print(f"   bulk writer:   {bulk_time:6.2f}s  ({len(saved) / bulk_time:,.0f} rows/s)")
+
+
+def process_image_full(image_data: bytes):
+    """The original decode path: full-size decode, then LANCZOS down to 800px"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(image_data))
+    image = image.convert('RGB')
+    if image.width > 800:
+        ratio = 800 / image.width
+        image = image.resize((800, int(image.height * ratio)), Image.Resampling.LANCZOS)
+    return image
+
+
+def _peak_rss_kb(reset: bool = False) -> int:
+    """Peak resident memory of this process (Linux VmHWM, resettable via clear_refs)"""
+    if reset:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return 0
+
+
+def _decode_probe(variant: str, path: str, repeat: int):
+    """Run one decode variant in a fresh process; returns (seconds per image, peak RSS delta in KB)
+
+    The peak includes holding the downloaded bytes themselves.
+    """
+    from nigerian_news_with_images import NigerianNewsBlogWithImages
+
+    baseline = _peak_rss_kb(reset=True)
+    with open(path, 'rb') as f:
+        image_data = f.read()
+    if variant == 'full':
+        process = process_image_full
+    else:
+        blog = NigerianNewsBlogWithImages.__new__(NigerianNewsBlogWithImages)
+        blog.max_image_width = 800
+        process = blog.process_image
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        process(image_data).tobytes()
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed, _peak_rss_kb() - baseline
+
+
+def benchmark_image_decode(size=(6000, 4000), repeat: int = 3):
+    """Full decode + LANCZOS vs JPEG draft-mode decode with reducing_gap"""
+    import multiprocessing
+    from PIL import Image
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'press_photo.jpg')
+        Image.effect_noise(size, 40).convert('RGB').save(path, 'JPEG', quality=92)
+        print(f"\n🖼️  Image decode: {size[0]}x{size[1]} JPEG, {os.path.getsize(path) / 1e6:.1f}MB")
+
+        context = multiprocessing.get_context('spawn')
+        for variant in ('full', 'draft'):
+            with context.Pool(1) as pool:
+                seconds, peak_kb = pool.apply(_decode_probe, (variant, path, repeat))
+            print(f"   {variant:6} {seconds * 1000:8.0f}ms/image   peak +{peak_kb / 1024:6.1f}MB")
+
+
+SUBPROCESS_CYCLE = """
+import sys
+sys.path.insert(0, {repo!r})
+from nigerian_news_with_images import NigerianNewsBlogWithImages
+app = NigerianNewsBlogWithImages()
+app.rss_feeds = {feeds!r}
+app.run_nigerian_news_cycle()
+"""
+
+
+def benchmark_ingestion_modes(cycles: int = 3, feed_count: int = 14):
+    """A fresh interpreter per cycle (subprocess mode) vs one warm in-process worker"""
+    import subprocess
+    from ingestion_worker import IngestionWorker
+
+    print(f"\n🔁 Ingestion modes: {cycles} cycles of {feed_count} feeds")
+    repo = os.path.dirname(os.path.abspath(__file__))
+    with FakeFeedServer(0.05) as server, scratch_app():
+        feeds = server.feeds(feed_count)
+
+        startup_time, _ = timed(subprocess.run, [sys.executable, '-c', 'import nigerian_news_with_images'],
+                                cwd=repo, capture_output=True)
+        subprocess_times = []
+        for _ in range(cycles):
+            seconds, _ = timed(subprocess.run, [sys.executable, '-c', SUBPROCESS_CYCLE.format(repo=repo, feeds=feeds)],
+                               capture_output=True, timeout=300)
+            subprocess_times.append(seconds)
+
+    with FakeFeedServer(0.05) as server, scratch_app():
+        feeds = server.feeds(feed_count)
+
+        def make_blog():
+            from nigerian_news_with_images import NigerianNewsBlogWithImages
+            blog = NigerianNewsBlogWithImages()
+            blog.rss_feeds = feeds
+            return blog
+
+        worker = IngestionWorker(make_blog)
+        inprocess_times = [timed(worker.enqueue(False).result)[0] for _ in range(cycles)]
+
+    print(f"   subprocess: interpreter + imports {startup_time:5.2f}s, "
+          f"cycles {', '.join(f'{t:.2f}s' for t in subprocess_times)}")
+    print(f"   in-process: worker startup {worker.startup_seconds:5.2f}s (once), "
+          f"cycles {', '.join(f'{t:.2f}s' for t in inprocess_times)}")
+
+
+def make_large_rss(count: int = 150, body_kb: int = 8) -> bytes:
+    """RSS with media tags and full content:encoded bodies, like the big WordPress feeds"""
+    body = '<p>' + 'Lagos traders react to the new policy. ' * (body_kb * 1024 // 40) + '</p>'
+    items = ''.join(f"""
+        <item>
+            <title>Story {i}</title>
+            <link>https://example.ng/story/{i}</link>
+            <guid>https://example.ng/?p={i}</guid>
+            <pubDate>{formatdate(time.time() - i * 600)}</pubDate>
+            <description><![CDATA[<p>Summary of story {i}</p>]]></description>
+            <content:encoded><![CDATA[<img src="https://cdn.example.ng/{i}.jpg"/>{body}]]></content:encoded>
+            <media:content url="https://cdn.example.ng/{i}.jpg" medium="image"/>
+        </item>""" for i in range(count))
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/" xmlns:media="http://search.yahoo.com/mrss/">
+<channel><title>Large feed</title>{items}</channel></rss>""".encode()
+
+
+def benchmark_feed_parsers(repeat: int = 3):
+    """feedparser vs the streaming iterparse fast path (set RECORDED_FEEDS_DIR to use recorded feeds)"""
+    import tracemalloc
+    import feedparser
+    import fast_feed_parser
+
+    recorded = os.environ.get('RECORDED_FEEDS_DIR')
+    if recorded:
+        documents = {name: open(os.path.join(recorded, name), 'rb').read() for name in sorted(os.listdir(recorded))}
+    else:
+        documents = {'synthetic 150 items x 8KB': make_large_rss()}
+
+    parsers = {
+        'feedparser': lambda data: feedparser.parse(data),
+        'streaming': fast_feed_parser.parse,
+    }
+    for name, data in documents.items():
+        print(f"\n📰 Feed parsing: {name} ({len(data) / 1024:.0f}KB)")
+        for parser_name, parse in parsers.items():
+            def consume():
+                feed = parse(data)
+                return sum(1 for entry in feed.entries if entry.get('title') and entry.get('link'))
+
+            try:
+                seconds, count = timed(lambda: [consume() for _ in range(repeat)])
+                tracemalloc.start()
+                consume()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            except fast_feed_parser.FeedFormatError as e:
+                print(f"   {parser_name:10} malformed ({e}), falls back to feedparser")
+                continue
+            print(f"   {parser_name:10} {seconds / repeat * 1000:7.1f}ms  peak {peak / 1e6:6.1f}MB  "
+                  f"({count[0]} entries)")
+
+
+def syndicated_articles(stories: int, copies: int, image_base: str = None, seed: int = 7):
+    """`stories` distinct stories, each republished by `copies` sources with small edits"""
+    import random
+
+    rng = random.Random(seed)
+    vocabulary = [f'word{i}' for i in range(5000)]
+    categories = ['nigeria', 'sports', 'entertainment']
+    articles = []
+    for story in range(stories):
+        words = rng.sample(vocabulary, 40)
+        for copy in range(copies):
+            title, body = ' '.join(words[:10]), words[10:]
+            if copy % 2:
+                # Re-cased headline and a couple of words edited by the republishing site
+                title = title.upper() + '!'
+                body = body[:-2] + rng.sample(vocabulary, 2)
+            articles.append({
+                'title': title,
+                'description': ' '.join(body) + f' The post {title} appeared first on Source {copy}.',
+                'url': f'https://source{copy}.ng/{seed}/{story}',
+                'published_date': formatdate(time.time() - story * 60),
+                'source': f'Source {copy}',
+                'category': categories[story % 3],
+                'image_url': f'{image_base}/{story}-{copy}.jpg' if image_base else None,
+            })
+    rng.shuffle(articles)
+    return articles
+
+
+def benchmark_near_duplicates(stories: int = 30, copies: int = 4, archive: int = 20000):
+    """Image downloads saved by MinHash clustering, and indexing cost against a large archive"""
+    print(f"\n🧬 Near-duplicates: {stories} stories x {copies} sources")
+    with FakeFeedServer(0, image_latency=0.05) as server, scratch_app() as blog:
+        image_base = f'http://127.0.0.1:{server.port}/img'
+        saved = blog.save_articles(syndicated_articles(stories, copies, image_base))
+        blog.image_pipeline.wait()
+        blog.near_duplicates.share_cluster_images(blog.pending_duplicates)
+        stats = blog.image_pipeline.stats()
+
+        import news_db
+        conn = news_db.connect(blog.db_name)
+        clusters = conn.execute("SELECT COUNT(DISTINCT cluster_id) FROM article_fingerprints").fetchone()[0]
+        with_image = conn.execute("SELECT COUNT(*) FROM article_images").fetchone()[0]
+        conn.close()
+        print(f"   {len(saved)} articles -> {clusters} clusters (expected {stories})")
+        print(f"   image downloads: {stats['processed'] + stats['failed']} instead of {len(saved)}, "
+              f"{with_image} articles linked to an image")
+
+        ids = blog.save_articles(syndicated_articles(archive, 1, seed=8))
+        more = blog.insert_articles(syndicated_articles(50, 1, seed=9))[0]
+        seconds, _ = timed(blog.near_duplicates.index_articles, more)
+        print(f"   indexing against {len(ids) + len(saved)} fingerprints: "
+              f"{seconds / len(more) * 1000:.2f}ms per article")
+
+
+def benchmark_image_transform_pool(count: int = 32, size=(1600, 1067), worker_counts=(1, 2, 4, 8)):
+    """Images/sec for decode+resize+encode (with srcset variants) inline vs on the process pool"""
+    from concurrent.futures import ThreadPoolExecutor
+    from PIL import Image
+    import image_transform
+
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, 'JPEG', quality=90)
+    image_data = buffer.getvalue()
+    print(f"\n🧮 Image transforms: {count} x {size[0]}x{size[1]} JPEG, {os.cpu_count()} CPU(s)")
+
+    for workers in (0,) + tuple(worker_counts):
+        pool = image_transform.ImageTransformPool(workers)
+        args = (image_transform.transform, image_data, 800, (320, 480), True)
+        pool.run(*args)  # start the worker processes outside the timing
+        with ThreadPoolExecutor(max(4, workers)) as threads:
+            seconds, _ = timed(lambda: list(threads.map(lambda _: pool.run(*args), range(count))))
+        pool.close()
+        label = 'inline (threads)' if workers == 0 else f'{workers} process(es)'
+        print(f"   {label:18} {count / seconds:6.1f} images/s")
+
+
+def benchmark_cycle_budget(feed_count: int = 6, feed_timeout: float = 2, cycle_budget: float = 4):
+    """A cycle with a trickling and a silent host still ends on time and keeps the healthy feeds"""
+    import socket
+    import news_db
+
+    print(f"\n⌛ Cycle budget: {feed_count} healthy feeds + 2 stuck hosts, "
+          f"{feed_timeout:.0f}s per feed, {cycle_budget:.0f}s per cycle")
+    silent = socket.socket()  # accepts connections (backlog) and never answers
+    silent.bind(('127.0.0.200', 0))
+    silent.listen(16)
+    with FakeFeedServer(0.1, with_images=True, image_latency=0.3) as server, scratch_app() as blog:
+        blog.feed_timeout, blog.cycle_budget = feed_timeout, cycle_budget
+        blog.rss_feeds = server.feeds(feed_count) + [
+            (f"http://127.0.0.100:{server.port}/trickle/feed", 'nigeria'),
+            (f"http://127.0.0.200:{silent.getsockname()[1]}/feed", 'sports'),
+        ]
+        seconds, _ = timed(blog.run_nigerian_news_cycle)
+
+        conn = news_db.connect(blog.db_name)
+        stored = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+        timeouts = conn.execute("SELECT COUNT(*) FROM metrics WHERE name IN ('feed.timeouts', 'feed.cancelled')"
+                                ).fetchone()[0]
+        watermarks = conn.execute("SELECT COUNT(*) FROM feed_state WHERE last_entry_id IS NOT NULL").fetchone()[0]
+        deferred = conn.execute("SELECT COUNT(*) FROM jobs WHERE kind = 'image_download' AND state = 'queued'"
+                                ).fetchone()[0]
+        conn.close()
+        stats = blog.image_pipeline.stats()
+        blog.image_pipeline.wait()  # let in-flight downloads finish before the scratch directory goes
+    silent.close()
+
+    print(f"   cycle finished in {seconds:5.2f}s: {stored} articles committed, "
+          f"{watermarks} watermarks saved, {timeouts} feeds timed out")
+    print(f"   images: {stats['processed']} ok, {stats['cancelled']} cancelled at the budget, "
+          f"{deferred} queued as jobs for the next cycle")
+
+
+def run_ingestion(blog, feeds, mode: str):
+    """Store `feeds` the old way (collect everything, then save) or streaming; returns first-commit time and rows"""
+    start = time.perf_counter()
+    if mode == 'batch':
+        articles = blog.filter_new_articles(fetch_feeds(blog, feeds))
+        saved_ids = blog.save_articles(articles)
+        return time.perf_counter() - start, len(saved_ids)
+
+    first_commit, stored = None, 0
+    for _, _, _, saved_ids in blog.ingest_feeds(blog.stream_feeds(feeds)):
+        if first_commit is None:
+            first_commit = time.perf_counter() - start
+        stored += len(saved_ids)
+    return first_commit, stored
+
+
+def benchmark_streaming_ingestion(feed_count: int = 24, items_per_feed: int = 100, latency: float = 0.3):
+    """Collect every feed then store (old cycle) vs storing each feed as it arrives: first commit and peak memory"""
+    import tracemalloc
+
+    print(f"\n🌊 Streaming ingestion: {feed_count} feeds x {items_per_feed} items, "
+          f"{latency * 1000:.0f}ms latency each")
+    results = {}
+    for mode in ('batch', 'streaming'):
+        with FakeFeedServer(latency, items_per_feed) as server, scratch_app() as blog:
+            total, (first_commit, stored) = timed(run_ingestion, blog, server.feeds(feed_count), mode)
+        # Peak Python memory in a separate run, as tracemalloc slows everything down
+        with FakeFeedServer(latency, items_per_feed) as server, scratch_app() as blog:
+            tracemalloc.start()
+            run_ingestion(blog, server.feeds(feed_count), mode)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        results[mode] = (first_commit, total, peak, stored)
+
+    for mode, (first_commit, total, peak, stored) in results.items():
+        print(f"   {mode:10} first commit {first_commit:5.2f}s, all stored {total:5.2f}s, "
+              f"peak {peak / 1024 / 1024:5.1f} MB  ({stored} rows)")
+
+
+class ConnectPerCall:
+    """The old pattern, for comparison: sqlite3.connect and close around every data method"""
+
+    def __init__(self, db_name: str):
+        self.db_name = db_name
+
+    @contextmanager
+    def connection(self):
+        import sqlite3
+
+        conn = sqlite3.connect(self.db_name)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def benchmark_connection_pool(renders: int = 2000, articles: int = 5000):
+    """Per page render DB cost: a connection per data method vs the pooled connection"""
+    import sqlite3
+
+    os.environ.setdefault('INGESTION_MODE', 'subprocess')
+    print(f"\n🔌 Connections: {renders} front page renders over {articles} articles")
+    with scratch_app() as blog:
+        blog.insert_articles(synthetic_articles(articles))
+        import flask_web_app
+
+        news_app = flask_web_app.NigerianNewsBlogApp()
+        news_app.should_fetch_news = lambda: False
+        pool = news_app.db
+
+        def connect_per_call():
+            news_app.get_recent_articles(15)
+            news_app.get_statistics()
+
+        def borrow():
+            with pool.connection():
+                pass
+
+        news_app.db = ConnectPerCall(news_app.db_name)
+        before, _ = timed(lambda: [connect_per_call() for _ in range(renders)])
+        news_app.db = pool
+        after, _ = timed(lambda: [news_app.render_data(15) for _ in range(renders)])
+
+        # The connection handling alone, without any queries
+        open_close, _ = timed(lambda: [sqlite3.connect(news_app.db_name).close() for _ in range(renders * 2)])
+        borrowed, _ = timed(lambda: [borrow() for _ in range(renders)])
+        pool.close()
+
+    print(f"   connect per call:  {before / renders * 1e6:6.0f} µs/render, "
+          f"of which opening 2 connections {open_close / renders * 1e6:5.0f} µs")
+    print(f"   pooled connection: {after / renders * 1e6:6.0f} µs/render, "
+          f"of which borrowing 1 connection {borrowed / renders * 1e6:5.1f} µs "
+          f"({pool.opened} connection(s) opened in total)")
+
+
+def benchmark_article_stats(sizes=(10000, 100000), reads: int = 50):
+    """Stats bar: three COUNT scans vs the trigger-maintained counters, and what the triggers cost on insert"""
+    import news_db
+
+    print(f"\n📊 Article statistics: scans vs counters, {reads} reads each")
+    for size in sizes:
+        insert_times = {}
+        for triggers in (False, True):
+            with scratch_app() as blog:
+                conn = news_db.connect(blog.db_name)
+                if not triggers:
+                    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                                                "AND name LIKE '%stats%'").fetchall():
+                        conn.execute(f"DROP TRIGGER {name}")
+                    conn.commit()
+                insert_times[triggers], _ = timed(blog.insert_articles, synthetic_articles(size))
+                if not triggers:
+                    conn.close()
+                    continue
+
+                def scans():
+                    return (conn.execute("SELECT COUNT(*) FROM articles").fetchone(),
+                            conn.execute("SELECT COUNT(*) FROM articles WHERE posted_to_social = TRUE").fetchone(),
+                            conn.execute("SELECT COUNT(DISTINCT source) FROM articles").fetchone())
+
+                scan_time, _ = timed(lambda: [scans() for _ in range(reads)])
+                counter_time, stats = timed(lambda: [news_db.read_article_stats(conn.cursor())
+                                                     for _ in range(reads)])
+                conn.close()
+
+        print(f"   {size:>7} articles: scans {scan_time / reads * 1000:7.2f} ms, "
+              f"counters {counter_time / reads * 1000:6.3f} ms per read; "
+              f"insert {insert_times[False]:5.2f}s -> {insert_times[True]:5.2f}s with triggers "
+              f"({stats[0]['total_articles']} counted)")
+
+
+def load_archive(conn, size: int, spacing: int = 30):
+    """Bulk-load `size` small articles, one every `spacing` seconds up to now, rotating through 6 categories"""
+    import news_db
+
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                                "AND name LIKE 'articles_stats%'").fetchall():
+        conn.execute(f"DROP TRIGGER {name}")
+    now = int(time.time())
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO articles (title, url, source, category, created_at, created_epoch, published_epoch)
+        SELECT 'Story ' || i, 'https://example.ng/archive/' || i, 'Source ' || (i % 12),
+               CASE WHEN i % 500 = 0 THEN 'rare' ELSE CASE i % 5 WHEN 0 THEN 'nigeria' WHEN 1 THEN 'sports'
+                    WHEN 2 THEN 'entertainment' WHEN 3 THEN 'business' ELSE 'politics' END END,
+               NULL, ? - (? - i) * ?, ? - (? - i) * ?
+        FROM n
+    """, (size, now, size, spacing, now, size, spacing))
+    news_db.recount_article_stats(conn.cursor())
+    conn.commit()
+
+
+def benchmark_random_sampling(sizes=(10000, 1000000, 10000000), limit: int = 15, reads: int = 20):
+    """Random front page: ORDER BY RANDOM() vs id-range sampling, over the archive and filtered"""
+    import news_db
+    from article_sampler import ArticleSampler
+
+    sampler = ArticleSampler()
+    week = 7 * 24 * 3600
+    cases = (
+        ('whole archive', None, None),
+        ('category', None, 'sports'),
+        ('last 7 days', week, None),
+        ('7 days + category', week, 'sports'),
+        ('rare category', None, 'rare'),
+    )
+    print(f"\n🎲 Random sampling: {limit} articles, ORDER BY RANDOM() vs ArticleSampler")
+    for size in sizes:
+        with scratch_app() as blog:
+            conn = news_db.connect(blog.db_name)
+            load_time, _ = timed(load_archive, conn, size)
+            print(f"   {size:>8} articles (loaded in {load_time:.1f}s, 1 every 30s):")
+            for label, window, category in cases:
+                since = int(time.time()) - window if window else None
+                cursor = conn.cursor()
+                join, where, params = sampler.filters(since, category, True)
+                old_reads = max(1, min(reads, 20000000 // (size * 10)))
+                before, _ = timed(lambda: [cursor.execute(
+                    f"SELECT a.id FROM articles a {join} WHERE {where} ORDER BY RANDOM() LIMIT ?",
+                    [*params, limit]).fetchall() for _ in range(old_reads)])
+                after, ids = timed(lambda: [sampler.sample(cursor, limit, since=since, category=category,
+                                                           unique=True) for _ in range(reads)])
+                print(f"      {label:<18} ORDER BY RANDOM() {before / old_reads * 1000:9.2f} ms, "
+                      f"sampler {after / reads * 1000:7.3f} ms ({len(ids[-1])} drawn)")
+            conn.close()
+
+
+BENCHMARKS = {
+    'feeds': benchmark_feed_fetching,
+    'conditional': benchmark_conditional_get,
+    'images': benchmark_image_pipeline,
+    'writes': benchmark_bulk_writer,
+    'decode': benchmark_image_decode,
+    'worker': benchmark_ingestion_modes,
+    'parse': benchmark_feed_parsers,
+    'dedupe': benchmark_near_duplicates,
+    'transform': benchmark_image_transform_pool,
+    'budget': benchmark_cycle_budget,
+    'streaming': benchmark_streaming_ingestion,
+    'connections': benchmark_connection_pool,
+    'stats': benchmark_article_stats,
+    'random': benchmark_random_sampling,
+}
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
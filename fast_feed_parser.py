@@ -0,0 +1,155 @@
+"""Streaming RSS/Atom parser for well-formed feeds.
+
+Yields only the fields fetch_news_from_rss and extract_image_from_entry read,
+clearing each <item>/<entry> element as soon as it is consumed, so memory stays
+flat and a consumer that stops early (high-watermark) never parses the rest.
+Malformed input, and anything other than RSS 2.0 or Atom, raises FeedFormatError
+so the caller can fall back to feedparser. Titles, summaries and content go
+through feedparser's HTML sanitizer, as they would in feedparser itself.
+"""
+import io
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from email.utils import mktime_tz, parsedate_tz
+from typing import Iterator
+
+from feedparser.sanitizer import _sanitize_html
+
+NS = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'media': 'http://search.yahoo.com/mrss/',
+    'content': 'http://purl.org/rss/1.0/modules/content/',
+}
+ATOM = '{%s}' % NS['atom']
+MEDIA = '{%s}' % NS['media']
+CONTENT_ENCODED = '{%s}encoded' % NS['content']
+
+
+class FeedFormatError(Exception):
+    """The document is not a well-formed RSS or Atom feed"""
+
+
+class FastEntry(dict):
+    """dict with attribute access, like feedparser's FeedParserDict"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def _parse_rfc822(value: str):
+    parsed = parsedate_tz(value) if value else None
+    return time.gmtime(mktime_tz(parsed)) if parsed else None
+
+
+def _parse_iso8601(value: str):
+    try:
+        return datetime.fromisoformat(value.strip()).utctimetuple() if value else None
+    except ValueError:
+        return None
+
+
+def _text(elem, tag: str) -> str:
+    child = elem.find(tag)
+    return (child.text or '').strip() if child is not None else None
+
+
+def _html(value: str) -> str:
+    """Feed HTML with scripts, event handlers and other unsafe markup removed"""
+    return _sanitize_html(value, 'utf-8', 'text/html').strip() if value else value
+
+
+def _media(elem, entry: FastEntry):
+    media_content = [FastEntry(url=m.get('url')) for m in elem.iter(MEDIA + 'content') if m.get('url')]
+    media_thumbnail = [FastEntry(url=m.get('url')) for m in elem.iter(MEDIA + 'thumbnail') if m.get('url')]
+    if media_content:
+        entry['media_content'] = media_content
+    if media_thumbnail:
+        entry['media_thumbnail'] = media_thumbnail
+
+
+def _rss_item(elem) -> FastEntry:
+    entry = FastEntry()
+    for key, tag in (('title', 'title'), ('link', 'link'), ('summary', 'description'),
+                     ('published', 'pubDate'), ('id', 'guid')):
+        value = _text(elem, tag)
+        if value is not None:
+            entry[key] = _html(value) if key in ('title', 'summary') else value
+    entry['published_parsed'] = _parse_rfc822(entry.get('published'))
+
+    enclosures = [FastEntry(href=e.get('url'), type=e.get('type', '')) for e in elem.findall('enclosure')]
+    if enclosures:
+        entry['enclosures'] = enclosures
+    encoded = elem.find(CONTENT_ENCODED)
+    if encoded is not None and encoded.text:
+        entry['content'] = [FastEntry(value=_html(encoded.text))]
+    _media(elem, entry)
+    return entry
+
+
+def _atom_entry(elem) -> FastEntry:
+    entry = FastEntry()
+    for key, tag in (('title', 'title'), ('summary', 'summary'), ('id', 'id')):
+        value = _text(elem, ATOM + tag)
+        if value is not None:
+            entry[key] = _html(value) if key != 'id' else value
+
+    for link in elem.findall(ATOM + 'link'):
+        rel = link.get('rel', 'alternate')
+        if rel == 'alternate' and 'link' not in entry:
+            entry['link'] = link.get('href')
+        elif rel == 'enclosure':
+            entry.setdefault('enclosures', []).append(FastEntry(href=link.get('href'), type=link.get('type', '')))
+
+    published = _text(elem, ATOM + 'published') or _text(elem, ATOM + 'updated')
+    if published:
+        entry['published'] = published
+    entry['published_parsed'] = _parse_iso8601(published)
+
+    content = _html(_text(elem, ATOM + 'content'))
+    if content:
+        entry['content'] = [FastEntry(value=content)]
+        entry.setdefault('summary', content)
+    _media(elem, entry)
+    return entry
+
+
+class StreamingFeed:
+    """`feed` holds channel-level fields (title) as they are seen; iterate `entries` lazily"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.feed = FastEntry()
+
+    @property
+    def entries(self) -> Iterator[FastEntry]:
+        depth = 0
+        root = None
+        try:
+            for event, elem in ET.iterparse(io.BytesIO(self.data), events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if root is None:
+                        root = elem
+                        if elem.tag not in ('rss', ATOM + 'feed'):
+                            raise FeedFormatError(f"not an RSS/Atom document (<{elem.tag}>)")
+                    continue
+
+                depth -= 1
+                if elem.tag == 'item':
+                    yield _rss_item(elem)
+                    elem.clear()
+                elif elem.tag == ATOM + 'entry':
+                    yield _atom_entry(elem)
+                    elem.clear()
+                elif elem.tag in ('title', ATOM + 'title') and 'title' not in self.feed and depth <= 2:
+                    self.feed['title'] = (elem.text or '').strip()
+        except ET.ParseError as e:
+            raise FeedFormatError(str(e))
+
+
+def parse(data: bytes) -> StreamingFeed:
+    return StreamingFeed(data)
@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+from urllib.parse import urlparse
+
+
+def host_of(url: str) -> str:
+    """Return the host part of a URL without the www. prefix"""
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class HostPoliteness:
+    """Per-host politeness limit: max parallel requests and spacing between them"""
+
+    def __init__(self, max_per_host: int = 1, min_interval: float = 0.5):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._last_request = {}
+
+    def _semaphore(self, host: str) -> threading.Semaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.Semaphore(self.max_per_host)
+            return self._semaphores[host]
+
+    @contextmanager
+    def slot(self, url: str):
+        """Hold a request slot for the URL's host, waiting out the min interval"""
+        host = host_of(url)
+        semaphore = self._semaphore(host)
+        with semaphore:
+            with self._lock:
+                wait = self._last_request.get(host, 0) + self.min_interval - time.monotonic()
+                self._last_request[host] = time.monotonic() + max(wait, 0)
+            if wait > 0:
+                time.sleep(wait)
+            yield
+
+
+class ConcurrentFeedFetcher:
+    """Fetch many RSS feeds in parallel on a thread pool"""
+
+    def __init__(self, fetch_func: Callable[[str, str], List[Dict]], max_workers: int = 8,
+                 max_per_host: int = 1, min_interval: float = 0.5):
+        self.fetch_func = fetch_func
+        self.max_workers = max_workers
+        self.politeness = HostPoliteness(max_per_host, min_interval)
+        self.last_cycle_seconds = None
+        self.unfinished = {}
+
+    def _fetch_one(self, rss_url: str, category: str) -> List[Dict]:
+        with self.politeness.slot(rss_url):
+            return self.fetch_func(rss_url, category)
+
+    def stream(self, rss_feeds: List[Tuple[str, str]], deadline: float = None,
+               buffer_size: int = 4) -> Iterator[Tuple[str, str, List[Dict]]]:
+        """Yield (url, category, articles) for each feed as soon as it is fetched
+
+        Finished feeds wait in a queue of `buffer_size`; when the consumer falls
+        behind, fetch workers block on it, so at most buffer_size + max_workers
+        feeds are held in memory. With a `deadline` (a time.monotonic() value),
+        feeds already waiting in the buffer at the deadline are still yielded;
+        the rest are listed in `unfinished` once the generator ends:
+        'cancelled' if they never started, 'timeout' if they were abandoned
+        mid-fetch (their own per-request deadline ends those threads).
+        """
+        start = time.perf_counter()
+        workers = max(1, min(self.max_workers, len(rss_feeds)))
+        self.unfinished = {}
+        results = queue.Queue(buffer_size)
+        closed = threading.Event()
+        started, yielded = set(), set()
+
+        def run(rss_url: str, category: str):
+            started.add(rss_url)
+            try:
+                articles = self._fetch_one(rss_url, category)
+            except Exception as e:
+                print(f"❌ Error fetching from {rss_url}: {str(e)}")
+                articles = []
+            while not closed.is_set():
+                try:
+                    results.put((rss_url, category, articles), timeout=0.5)
+                    return
+                except queue.Full:
+                    pass
+
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='feed')
+        try:
+            for rss_url, category in rss_feeds:
+                pool.submit(run, rss_url, category)
+            for _ in rss_feeds:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    result = results.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                yielded.add(result[0])
+                yield result
+            # Out of time: feeds already fetched are handed over rather than dropped
+            while len(yielded) < len(rss_feeds):
+                try:
+                    result = results.get_nowait()
+                except queue.Empty:
+                    break
+                yielded.add(result[0])
+                yield result
+        finally:
+            # Do not wait for stragglers; they drop their results once closed is set
+            closed.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.unfinished = {rss_url: 'timeout' if rss_url in started else 'cancelled'
+                               for rss_url, _ in rss_feeds if rss_url not in yielded}
+            self.last_cycle_seconds = time.perf_counter() - start
+
+    def fetch_all(self, rss_feeds: List[Tuple[str, str]],
+                  deadline: float = None) -> List[Tuple[str, str, List[Dict]]]:
+        """Fetch all feeds and return (url, category, articles) in feed order
+
+        Feeds not finished by `deadline` are left out and listed in `unfinished`.
+        """
+        order = {rss_url: index for index, (rss_url, _) in enumerate(rss_feeds)}
+        return sorted(self.stream(rss_feeds, deadline, buffer_size=len(rss_feeds) or 1),
+                      key=lambda result: order[result[0]])
@@ -0,0 +1,110 @@
+import random
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+import news_db
+
+
+class FeedScheduler:
+    """Adaptive per-feed polling schedule
+
+    Each feed keeps an EWMA of its publishing rate (new entries per second).
+    The poll interval aims at `target_new_per_poll` new entries, is stretched
+    when the feed answers 304 or brings nothing new, backs off exponentially
+    on errors, and is always clamped to [min_interval, max_interval] with
+    +/- `jitter` randomisation so feeds do not synchronise.
+    """
+
+    def __init__(self, db_name: str, min_interval: int = 5 * 60, max_interval: int = 2 * 60 * 60,
+                 initial_interval: int = 30 * 60, target_new_per_poll: float = 3,
+                 smoothing: float = 0.3, jitter: float = 0.1):
+        self.db_name = db_name
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        self.target_new_per_poll = target_new_per_poll
+        self.smoothing = smoothing
+        self.jitter = jitter
+
+    def setup(self, cursor):
+        """Create the schedule table (called from setup_database)"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS feed_schedule (
+                feed_url TEXT PRIMARY KEY,
+                interval_seconds REAL,
+                next_fetch_at REAL,
+                last_fetch_at REAL,
+                publish_rate REAL,
+                consecutive_errors INTEGER DEFAULT 0
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_feed_schedule_next ON feed_schedule (next_fetch_at)")
+
+    def due_feeds(self, rss_feeds: List[Tuple[str, str]], now: float = None) -> List[Tuple[str, str]]:
+        """Feeds whose next fetch time has passed (feeds never fetched are always due)"""
+        now = now or time.time()
+        conn = news_db.connect(self.db_name)
+        scheduled = dict(conn.execute("SELECT feed_url, next_fetch_at FROM feed_schedule").fetchall())
+        conn.close()
+        return [(url, category) for url, category in rss_feeds
+                if scheduled.get(url) is None or scheduled[url] <= now]
+
+    def next_due_at(self, rss_feeds: List[Tuple[str, str]] = None) -> Optional[float]:
+        """Earliest next fetch time over all feeds; None if some feed has never been scheduled"""
+        try:
+            conn = news_db.connect(self.db_name)
+            rows = dict(conn.execute("SELECT feed_url, next_fetch_at FROM feed_schedule").fetchall())
+            conn.close()
+        except sqlite3.OperationalError:
+            return None
+
+        if not rows or (rss_feeds and any(url not in rows for url, _ in rss_feeds)):
+            return None
+        return min(rows.values())
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def record(self, feed_url: str, outcome: str, new_count: int = 0, now: float = None) -> float:
+        """Update a feed's schedule after a fetch; outcome is 'ok', 'not_modified', 'error' or 'timeout'
+
+        Returns the number of seconds until the feed is next due.
+        """
+        now = now or time.time()
+        conn = news_db.connect(self.db_name)
+        row = conn.execute("""
+            SELECT interval_seconds, last_fetch_at, publish_rate, consecutive_errors
+            FROM feed_schedule WHERE feed_url = ?
+        """, (feed_url,)).fetchone()
+        interval, last_fetch_at, rate, errors = row or (self.initial_interval, None, None, 0)
+
+        failed = outcome in ('error', 'timeout')
+        if failed:
+            errors += 1
+            delay = self._clamp(interval * 2 ** errors)
+        else:
+            errors = 0
+            if last_fetch_at:
+                observed = new_count / max(now - last_fetch_at, 1)
+                rate = observed if rate is None else self.smoothing * observed + (1 - self.smoothing) * rate
+
+            if rate:
+                interval = self._clamp(self.target_new_per_poll / rate)
+            elif new_count == 0:
+                interval = self._clamp(interval * 1.5)
+            delay = interval
+
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        conn.execute("""
+            INSERT INTO feed_schedule
+                (feed_url, interval_seconds, next_fetch_at, last_fetch_at, publish_rate, consecutive_errors)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(feed_url) DO UPDATE SET
+                interval_seconds = excluded.interval_seconds, next_fetch_at = excluded.next_fetch_at,
+                last_fetch_at = excluded.last_fetch_at, publish_rate = excluded.publish_rate,
+                consecutive_errors = excluded.consecutive_errors
+        """, (feed_url, interval, now + delay, now if not failed else last_fetch_at, rate, errors))
+        conn.commit()
+        conn.close()
+        return delay
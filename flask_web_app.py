@@ -5,27 +5,57 @@ import os
 import threading
 import subprocess
 import sys
+import time
+from feed_scheduler import FeedScheduler
+from ingestion_worker import IngestionWorker
+from host_health import HostCircuitBreaker, NegativeCache
+from metrics import MetricsRecorder
+from article_sampler import ArticleSampler
+import migrations
+import news_db
 
 app = Flask(__name__)
 
+# Rendered card width: full width on phones, one grid column (~400px) otherwise
+IMAGE_SIZES = "(max-width: 768px) 100vw, 400px"
+ARTICLE_COLUMNS = """a.id, a.title, a.description, a.url, a.published_date, a.source, a.category,
+               a.local_image_path, a.posted_to_social"""
+
 
 class NigerianNewsBlogApp:
     def __init__(self):
         self.db_name = 'nigerian_news_blog.db'
         self.last_fetch = None
-        self.fetch_interval = 30  # minutes
+        self.check_interval = 60  # seconds between schedule checks
+        self.last_check = None
         self.is_fetching = False
+        self.db = news_db.ConnectionPool(self.db_name)
+        self.scheduler = FeedScheduler(self.db_name)
+        self.metrics = MetricsRecorder(self.db_name)
+        self.circuit_breaker = HostCircuitBreaker(self.db_name)
+        self.negative_cache = NegativeCache(self.db_name)
+        self.sampler = ArticleSampler()
+        self.migrate_schema()
+        # 'inprocess' keeps one warm ingestion worker; 'subprocess' runs the script per fetch
+        self.ingestion_mode = os.environ.get('INGESTION_MODE', 'inprocess')
+        self.worker = IngestionWorker() if self.ingestion_mode == 'inprocess' else None
+
+    def migrate_schema(self):
+        """Bring the articles schema, counters and indexes the pages read up to date"""
+        with self.db.connection() as conn:
+            migrations.migrate(conn.cursor())
 
     def should_fetch_news(self):
-        """Check if we should fetch new news"""
-        if self.last_fetch is None:
-            return True
+        """Check if any feed is due according to the adaptive feed schedule"""
+        if self.last_check and (datetime.now() - self.last_check).total_seconds() < self.check_interval:
+            return False
+        self.last_check = datetime.now()
 
-        time_diff = datetime.now() - self.last_fetch
-        return time_diff.total_seconds() > (self.fetch_interval * 60)
+        next_due_at = self.scheduler.next_due_at()
+        return next_due_at is None or next_due_at <= time.time()
 
-    def fetch_news_background(self):
-        """Fetch news in background"""
+    def fetch_news_background(self, due_only=True):
+        """Fetch news in background (only the feeds that are due, unless forced)"""
         if self.is_fetching:
             return
 
@@ -33,8 +63,16 @@ class NigerianNewsBlogApp:
         try:
             print("🔄 Auto-fetching fresh news...")
 
+            if self.worker:
+                # Hand the cycle to the warm in-process worker
+                seconds = self.worker.enqueue(due_only).result(timeout=300)
+                self.last_fetch = datetime.now()
+                print(f"✅ Fresh news fetched successfully in {seconds:.1f}s!")
+                return
+
             # Run the news fetcher script
-            result = subprocess.run([sys.executable, 'nigerian_news_with_images.py'],
+            command = [sys.executable, 'nigerian_news_with_images.py'] + (['--due'] if due_only else [])
+            result = subprocess.run(command,
                                     capture_output=True, text=True, timeout=300)
 
             if result.returncode == 0:
@@ -48,7 +86,7 @@ class NigerianNewsBlogApp:
         finally:
             self.is_fetching = False
 
-    def get_recent_articles(self, limit=15, random_mode=False):
+    def get_recent_articles(self, limit=15, random_mode=False, category=None, days=7):
         # Check if we should fetch new news
         if self.should_fetch_news() and not self.is_fetching:
             # Fetch news in background thread (non-blocking)
@@ -56,90 +94,123 @@ class NigerianNewsBlogApp:
             thread.daemon = True
             thread.start()
 
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                rows = self.query_front_page(cursor, limit, random_mode, category, days, collapse_duplicates=True)
+            except sqlite3.OperationalError:
+                # database predates near-duplicate clustering
+                rows = self.query_front_page(cursor, limit, random_mode, category, days, collapse_duplicates=False)
+
+            articles = []
+            for row in rows:
+                articles.append({
+                    'id': row[0], 'title': row[1], 'description': row[2], 'url': row[3],
+                    'published_date': row[4], 'source': row[5], 'category': row[6],
+                    'local_image_path': row[7] or 'images/fallbacks/news_default.jpg',
+                    'posted_to_social': row[8]
+                })
+
+            self.attach_image_srcsets(cursor, articles)
 
-        if random_mode:
-            # Show random articles from recent days
-            cursor.execute("""
-                SELECT id, title, description, url, published_date, source, category, 
-                       local_image_path, posted_to_social
-                FROM articles 
-                WHERE datetime(created_at) >= datetime('now', '-7 days')
-                ORDER BY RANDOM() 
-                LIMIT ?
-            """, (limit,))
-        else:
-            # Show latest articles (normal mode)
-            cursor.execute("""
-                SELECT id, title, description, url, published_date, source, category, 
-                       local_image_path, posted_to_social
-                FROM articles 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            """, (limit,))
-
-        articles = []
-        for row in cursor.fetchall():
-            articles.append({
-                'id': row[0], 'title': row[1], 'description': row[2], 'url': row[3],
-                'published_date': row[4], 'source': row[5], 'category': row[6],
-                'local_image_path': row[7] or 'images/fallbacks/news_default.jpg',
-                'posted_to_social': row[8]
-            })
-
-        conn.close()
         return articles
 
-    def get_statistics(self):
-        """Get blog statistics"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+    def query_front_page(self, cursor, limit, random_mode, category=None, days=7, collapse_duplicates=True):
+        """Select front page rows, showing only the first-seen article of each near-duplicate cluster"""
+        if random_mode:
+            # Random articles from recent days, sampled by id instead of ORDER BY RANDOM()
+            since = int(time.time()) - days * 24 * 3600 if days else None
+            ids = self.sampler.sample(cursor, limit, since=since, category=category, unique=collapse_duplicates)
+            return self.sampler.fetch(cursor, ids, ARTICLE_COLUMNS)
 
-        stats = {}
+        if collapse_duplicates:
+            join, unique = news_db.UNIQUE_ARTICLES_JOIN, news_db.UNIQUE_ARTICLES_WHERE
+        else:
+            join, unique = "", "1"
 
-        # Total articles
-        cursor.execute("SELECT COUNT(*) FROM articles")
-        stats['total_articles'] = cursor.fetchone()[0]
+        # Show latest articles (normal mode)
+        cursor.execute(news_db.NEWEST_ARTICLES_SQL.format(columns=ARTICLE_COLUMNS, join=join, where=unique),
+                       (limit,))
+        return cursor.fetchall()
 
-        # Posted to social
-        cursor.execute("SELECT COUNT(*) FROM articles WHERE posted_to_social = TRUE")
-        stats['posted_to_social'] = cursor.fetchone()[0]
+    def attach_image_srcsets(self, cursor, articles):
+        """Add JPEG and WebP srcset strings from the stored image variants"""
+        if not articles:
+            return
 
-        # Sources count
-        cursor.execute("SELECT COUNT(DISTINCT source) FROM articles")
-        stats['sources_count'] = cursor.fetchone()[0]
+        placeholders = ','.join('?' * len(articles))
+        try:
+            cursor.execute(f"""
+                SELECT ai.article_id, v.format, v.width, v.local_path
+                FROM article_images ai
+                JOIN image_variants v ON v.content_hash = ai.content_hash
+                WHERE ai.article_id IN ({placeholders})
+                ORDER BY v.width
+            """, [article['id'] for article in articles])
+        except sqlite3.OperationalError:
+            return  # database predates image variants
+
+        srcsets = {}
+        for article_id, fmt, width, local_path in cursor.fetchall():
+            srcsets.setdefault((article_id, fmt), []).append(f"/static/{local_path} {width}w")
+
+        for article in articles:
+            article['srcset'] = ', '.join(srcsets.get((article['id'], 'jpeg'), []))
+            article['webp_srcset'] = ', '.join(srcsets.get((article['id'], 'webp'), []))
+
+    def get_statistics(self, breakdown=False):
+        """Get blog statistics (per source and category too with breakdown)"""
+        with self.db.connection() as conn:
+            # Counters kept up to date by triggers (news_db.migrate_article_stats)
+            stats = news_db.read_article_stats(conn.cursor(), breakdown=breakdown)
 
         # Fetch status
         stats['is_fetching'] = self.is_fetching
 
-        conn.close()
         return stats
 
+    def render_data(self, limit=15, random_mode=False, category=None):
+        """Articles and statistics for one page, read over a single pooled connection"""
+        with self.db.connection():
+            return (self.get_recent_articles(limit, random_mode=random_mode, category=category),
+                    self.get_statistics())
+
+
+# Built on the first request, not at import: image transform workers import
+# the launching script as __mp_main__ and must not open the database
+news_app = None
+news_app_lock = threading.Lock()
+
 
-news_app = NigerianNewsBlogApp()
+@app.before_request
+def load_news_app():
+    global news_app
+    with news_app_lock:
+        if news_app is None:
+            news_app = NigerianNewsBlogApp()
 
 
 @app.route('/')
 def index():
     # Get latest articles (normal mode)
-    all_articles = news_app.get_recent_articles(15, random_mode=False)
-    stats = news_app.get_statistics()
+    all_articles, stats = news_app.render_data(15, random_mode=False)
 
     return render_template('index.html',
                            articles=all_articles,
-                           stats=stats)
+                           stats=stats,
+                           image_sizes=IMAGE_SIZES)
 
 
 @app.route('/random')
 def random_articles():
-    """Show random recent articles"""
-    all_articles = news_app.get_recent_articles(15, random_mode=True)
-    stats = news_app.get_statistics()
+    """Show random recent articles, optionally from one category"""
+    all_articles, stats = news_app.render_data(15, random_mode=True, category=request.args.get('category'))
 
     return render_template('index.html',
                            articles=all_articles,
-                           stats=stats)
+                           stats=stats,
+                           image_sizes=IMAGE_SIZES)
 
 
 @app.route('/api/articles')
@@ -151,19 +222,26 @@ def api_articles():
 
 @app.route('/api/random-articles')
 def api_random_articles():
-    """Get random recent articles"""
+    """Get random recent articles (?category=sports, ?days=30; days=0 samples the whole archive)"""
     limit = request.args.get('limit', 15, type=int)
-    articles = news_app.get_recent_articles(limit, random_mode=True)
+    articles = news_app.get_recent_articles(limit, random_mode=True, category=request.args.get('category'),
+                                            days=request.args.get('days', 7, type=int))
     return jsonify(articles)
 
 
+@app.route('/api/stats')
+def api_stats():
+    """Article totals with per-source and per-category counts"""
+    return jsonify(news_app.get_statistics(breakdown=True))
+
+
 @app.route('/api/fetch-news')
 def api_fetch_news():
     """Manual trigger to fetch fresh news"""
     if news_app.is_fetching:
         return jsonify({"status": "already_fetching", "message": "News fetch already in progress"})
 
-    thread = threading.Thread(target=news_app.fetch_news_background)
+    thread = threading.Thread(target=news_app.fetch_news_background, kwargs={'due_only': False})
     thread.daemon = True
     thread.start()
     return jsonify({"status": "fetching", "message": "Fresh news being fetched in background"})
@@ -172,12 +250,32 @@ def api_fetch_news():
 @app.route('/api/status')
 def api_status():
     """Get fetch status"""
+    try:
+        circuits = news_app.circuit_breaker.snapshot()
+        negative_cache = news_app.negative_cache.snapshot()
+    except sqlite3.OperationalError:
+        circuits, negative_cache = [], None  # tables are created by the first ingestion run
     return jsonify({
         "is_fetching": news_app.is_fetching,
-        "last_fetch": news_app.last_fetch.isoformat() if news_app.last_fetch else None
+        "last_fetch": news_app.last_fetch.isoformat() if news_app.last_fetch else None,
+        "ingestion_mode": news_app.ingestion_mode,
+        "worker": news_app.worker.stats() if news_app.worker else None,
+        "circuits": circuits,
+        "negative_cache": negative_cache
     })
 
 
+@app.route('/api/metrics')
+def api_metrics():
+    """Ingestion metrics with percentiles, overall and per feed (?hours=24)"""
+    hours = request.args.get('hours', 24, type=float)
+    try:
+        return jsonify(news_app.metrics.summary(hours))
+    except sqlite3.OperationalError:
+        # no ingestion cycle has created the metrics table yet
+        return jsonify({"window_hours": hours, "metrics": {}, "feeds": {}, "cycles": []})
+
+
 @app.route('/static/<path:filename>')
 def serve_static(filename):
     """Serve static files (images)"""
@@ -188,7 +286,7 @@ if __name__ == '__main__':
     print("🇳🇬📸 Nigerian News Flask server with Random Articles!")
     print("🌐 Visit: http://localhost:5000")
     print("🎲 Random articles: http://localhost:5000/random")
-    print("🔄 Auto-fetches fresh news every 30 minutes")
+    print("🔄 Auto-fetches each feed on its own adaptive schedule")
     print("📱 Manual refresh shows random articles")
     app.run(debug=True, host='0.0.0.0', port=5000)
 
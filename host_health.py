@@ -0,0 +1,231 @@
+import random
+import threading
+import time
+from typing import Dict, List
+
+import requests
+from urllib3.exceptions import TimeoutError as Urllib3Timeout
+
+import news_db
+from feed_fetcher import host_of
+from image_store import url_hash
+
+# Status codes that say the URL itself is bad rather than the host being down
+PERMANENT_STATUSES = (400, 401, 403, 404, 410, 451)
+
+
+def is_host_failure(error: Exception) -> bool:
+    """Connection problems, timeouts and 5xx responses count against the host"""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.RetryError))
+
+
+def is_timeout(error: Exception) -> bool:
+    """The host did not answer in time; requests reports read timeouts that used up every retry as ConnectionError"""
+    if isinstance(error, requests.Timeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if isinstance(error, requests.ConnectionError) and error.args else None
+    return isinstance(reason, Urllib3Timeout)
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    """The URL will not start working by itself: 4xx, or the body is not a usable image"""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in PERMANENT_STATUSES
+    if isinstance(error, (requests.RequestException, TimeoutError)):
+        return False
+    # ValueError from the size/type checks, OSError from PIL failing to decode
+    return isinstance(error, (ValueError, OSError))
+
+
+class HostCircuitBreaker:
+    """Per-host circuit breaker shared by feed and image downloads
+
+    After `failure_threshold` consecutive host failures the circuit opens and
+    requests to that host are refused without touching the network. Once the
+    open period has passed a single probe request is let through (half-open,
+    for up to `probe_timeout` seconds): success closes the circuit, failure
+    reopens it for twice as long, up to `max_open_seconds`. State is kept in
+    memory and mirrored to SQLite so the subprocess ingestion mode and the
+    status API see it too.
+    """
+
+    def __init__(self, db_name: str, failure_threshold: int = 3, open_seconds: float = 5 * 60,
+                 max_open_seconds: float = 60 * 60, probe_timeout: float = 60):
+        self.db_name = db_name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.probe_timeout = probe_timeout
+        self.hosts = {}
+        self._probing = {}
+        self._lock = threading.Lock()
+
+    def setup(self, cursor):
+        """Create the circuit table and load its state (called from setup_database)"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS host_circuits (
+                host TEXT PRIMARY KEY,
+                failures INTEGER DEFAULT 0,
+                open_until REAL,
+                open_seconds REAL,
+                last_error TEXT,
+                updated_at REAL
+            )
+        """)
+        cursor.execute("SELECT host, failures, open_until, open_seconds, last_error FROM host_circuits")
+        self.hosts = {host: {'failures': failures, 'open_until': open_until, 'open_seconds': open_seconds,
+                             'last_error': last_error}
+                      for host, failures, open_until, open_seconds, last_error in cursor.fetchall()}
+
+    def _save(self, host: str):
+        state = self.hosts.get(host)
+        conn = news_db.connect(self.db_name)
+        if state is None:
+            conn.execute("DELETE FROM host_circuits WHERE host = ?", (host,))
+        else:
+            conn.execute("""
+                INSERT OR REPLACE INTO host_circuits (host, failures, open_until, open_seconds, last_error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (host, state['failures'], state['open_until'], state['open_seconds'], state['last_error'],
+                  time.time()))
+        conn.commit()
+        conn.close()
+
+    def allow(self, url: str) -> bool:
+        """False while the host's circuit is open; lets one probe through once it expires"""
+        host = host_of(url)
+        now = time.time()
+        with self._lock:
+            state = self.hosts.get(host)
+            if not state or not state['open_until']:
+                return True
+            if now < state['open_until'] or now - self._probing.get(host, 0) < self.probe_timeout:
+                return False
+            self._probing[host] = now
+            return True
+
+    def record_success(self, url: str):
+        host = host_of(url)
+        with self._lock:
+            self._probing.pop(host, None)
+            if host not in self.hosts:
+                return
+            del self.hosts[host]
+        self._save(host)
+        print(f"🟢 Circuit closed for {host}")
+
+    def record_failure(self, url: str, error: Exception):
+        host = host_of(url)
+        with self._lock:
+            probe = self._probing.pop(host, None) is not None
+            state = self.hosts.setdefault(host, {'failures': 0, 'open_until': None, 'open_seconds': None,
+                                                 'last_error': None})
+            state['failures'] += 1
+            state['last_error'] = str(error)[:300]
+            opened = probe or state['failures'] >= self.failure_threshold
+            if opened:
+                previous = state['open_seconds']
+                state['open_seconds'] = min(self.max_open_seconds, previous * 2) if probe and previous \
+                    else self.open_seconds
+                state['open_until'] = time.time() + state['open_seconds']
+        self._save(host)
+        if opened:
+            print(f"🔴 Circuit open for {host} ({state['open_seconds'] / 60:.0f} min): {state['last_error']}")
+
+    def snapshot(self) -> List[Dict]:
+        """Hosts with recent failures as persisted (so any process can report them), for the status API"""
+        now = time.time()
+        conn = news_db.connect(self.db_name)
+        rows = conn.execute("SELECT host, failures, open_until, last_error FROM host_circuits ORDER BY host").fetchall()
+        conn.close()
+        return [{'host': host, 'failures': failures,
+                 'state': 'open' if open_until and open_until > now else 'half_open' if open_until else 'closed',
+                 'open_until': open_until, 'last_error': last_error}
+                for host, failures, open_until, last_error in rows]
+
+
+class NegativeCache:
+    """Persisted cache of image URLs that failed, so they are not retried every cycle
+
+    Transient failures expire after `base_ttl`, doubling with each repeat up to
+    `max_ttl`; permanent ones (404, not an image, too large) start at
+    `permanent_ttl`. A little jitter keeps entries from expiring together.
+    """
+
+    def __init__(self, db_name: str, base_ttl: float = 15 * 60, permanent_ttl: float = 24 * 60 * 60,
+                 max_ttl: float = 7 * 24 * 60 * 60):
+        self.db_name = db_name
+        self.base_ttl = base_ttl
+        self.permanent_ttl = permanent_ttl
+        self.max_ttl = max_ttl
+
+    def setup(self, cursor):
+        """Create the negative cache table (called from setup_database)"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS failed_image_urls (
+                url_hash TEXT PRIMARY KEY,
+                image_url TEXT,
+                host TEXT,
+                failures INTEGER DEFAULT 1,
+                permanent BOOLEAN DEFAULT FALSE,
+                last_error TEXT,
+                retry_after REAL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_failed_image_urls_retry ON failed_image_urls (retry_after)")
+
+    def is_blocked(self, image_url: str) -> bool:
+        conn = news_db.connect(self.db_name)
+        row = conn.execute("SELECT retry_after FROM failed_image_urls WHERE url_hash = ?",
+                           (url_hash(image_url),)).fetchone()
+        conn.close()
+        return row is not None and row[0] > time.time()
+
+    def add(self, image_url: str, error: Exception, permanent: bool = False):
+        """Remember a failed URL; its TTL doubles with every repeated failure"""
+        key = url_hash(image_url)
+        conn = news_db.connect(self.db_name)
+        row = conn.execute("SELECT failures FROM failed_image_urls WHERE url_hash = ?", (key,)).fetchone()
+        failures = row[0] + 1 if row else 1
+        ttl = min(self.max_ttl, (self.permanent_ttl if permanent else self.base_ttl) * 2 ** (failures - 1))
+        conn.execute("""
+            INSERT OR REPLACE INTO failed_image_urls
+                (url_hash, image_url, host, failures, permanent, last_error, retry_after)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (key, image_url, host_of(image_url), failures, permanent, str(error)[:300],
+              time.time() + ttl * random.uniform(0.9, 1.1)))
+        conn.commit()
+        conn.close()
+
+    def clear(self, image_url: str):
+        conn = news_db.connect(self.db_name)
+        conn.execute("DELETE FROM failed_image_urls WHERE url_hash = ?", (url_hash(image_url),))
+        conn.commit()
+        conn.close()
+
+    def snapshot(self, limit: int = 20) -> Dict:
+        """Counts and the most recent blocked URLs, for the status API"""
+        now = time.time()
+        conn = news_db.connect(self.db_name)
+        blocked, permanent = conn.execute("""
+            SELECT COUNT(*), COALESCE(SUM(permanent), 0) FROM failed_image_urls WHERE retry_after > ?
+        """, (now,)).fetchone()
+        by_host = conn.execute("""
+            SELECT host, COUNT(*) FROM failed_image_urls WHERE retry_after > ?
+            GROUP BY host ORDER BY COUNT(*) DESC LIMIT ?
+        """, (now, limit)).fetchall()
+        recent = conn.execute("""
+            SELECT image_url, failures, permanent, last_error, retry_after FROM failed_image_urls
+            WHERE retry_after > ? ORDER BY retry_after DESC LIMIT ?
+        """, (now, limit)).fetchall()
+        conn.close()
+        return {
+            'blocked_urls': blocked,
+            'permanent': permanent,
+            'by_host': dict(by_host),
+            'recent': [{'url': url, 'failures': failures, 'permanent': bool(perm), 'last_error': error,
+                        'retry_after': retry_after}
+                       for url, failures, perm, error, retry_after in recent],
+        }
@@ -0,0 +1,81 @@
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class DeadlineExceeded(requests.Timeout):
+    """The request, body included, did not finish before its deadline"""
+
+
+class HttpClient:
+    """Shared keep-alive HTTP session for feed and image downloads
+
+    One connection pool per host (up to `pool_connections` hosts) holding at most
+    `max_per_host` connections; extra requests to a busy host wait for a free
+    connection instead of opening a new TCP+TLS handshake.
+    """
+
+    def __init__(self, pool_connections: int = 32, max_per_host: int = 4,
+                 connect_timeout: float = 5, read_timeout: float = 15, retries: int = 2):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept-Encoding': 'gzip, deflate',
+        })
+
+        retry = Retry(total=retries, connect=retries, read=retries, backoff_factor=0.5,
+                      status_forcelist=(502, 503, 504), allowed_methods=('GET', 'HEAD'))
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=max_per_host,
+                              pool_block=True, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url: str, headers: dict = None, stream: bool = False, timeout=None) -> requests.Response:
+        """GET through the shared pool with the default timeouts"""
+        return self.session.get(url, headers=headers, stream=stream, timeout=timeout or self.timeout)
+
+    def get_with_deadline(self, url: str, headers: dict = None, deadline: float = None) -> requests.Response:
+        """GET and read the whole body before `deadline` (a time.monotonic() value)
+
+        The connect/read timeouts only bound each socket operation, so a server
+        trickling bytes can hold a plain get() open far longer. Here every
+        attempt (retries included) gets an equal share of the time left, and the
+        body is read as it arrives, checking the clock between reads.
+        """
+        if deadline is None:
+            return self.get(url, headers=headers)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"deadline passed before requesting {url}")
+        connect_timeout, read_timeout = self.timeout
+        per_attempt = remaining / (self.retries + 1)
+        response = self.get(url, headers=headers, stream=True,
+                            timeout=(min(connect_timeout, per_attempt), min(read_timeout, per_attempt)))
+        chunks = []
+        try:
+            # read1 returns whatever has arrived; iter_content waits for a full chunk (urllib3 < 2)
+            if hasattr(response.raw, 'read1'):
+                body = iter(lambda: response.raw.read1(64 * 1024, decode_content=True), b'')
+            else:
+                body = response.iter_content(64 * 1024)
+            for chunk in body:
+                chunks.append(chunk)
+                if time.monotonic() > deadline:
+                    raise DeadlineExceeded(f"{url} still downloading at its deadline")
+        except Exception:
+            response.close()
+            raise
+        response._content = b''.join(chunks)
+        response._content_consumed = True
+        response.close()  # body fully read: hands the connection back to the pool
+        return response
+
+    def close(self):
+        self.session.close()
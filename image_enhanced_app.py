@@ -1,5 +1,4 @@
 from flask import Flask, render_template_string, jsonify, request
-import sqlite3
 import os
 from datetime import datetime
 import threading
@@ -7,120 +6,98 @@ import time
 import requests
 from urllib.parse import urlparse
 
+import migrations
+import news_db
+from article_sampler import ArticleSampler
+
 app = Flask(__name__)
 
 class NigerianNewsBlogApp:
     def __init__(self):
         self.db_name = 'nigerian_news_blog.db'
+        self.db = news_db.ConnectionPool(self.db_name)
+        self.sampler = ArticleSampler()
         self.setup_database()
     
     def setup_database(self):
         """Create database with sample articles and REAL images"""
         try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS articles (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    url TEXT UNIQUE NOT NULL,
-                    published_date TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    source TEXT,
-                    category TEXT DEFAULT 'nigeria',
-                    local_image_path TEXT,
-                    posted_to_social BOOLEAN DEFAULT FALSE
-                )
-            ''')
-            
-            # Sample articles with REAL Nigerian images
-            sample_articles = [
-                ("Breaking: Nigerian Economy Records 4.2% Growth in Q4 2025", "Nigeria's economy demonstrates exceptional resilience with robust growth across technology, agriculture, and oil sectors, marking the highest quarterly growth in five years.", "https://naijanews.com/economy-growth-2025", "2025-09-29 16:00:00", "Vanguard Nigeria", "nigeria", "https://images.unsplash.com/photo-1541746972996-4e0b0f93e586?w=400&h=250&fit=crop"),
-                ("Super Eagles Secure Historic AFCON 2026 Victory", "Nigerian national football team delivers spectacular 3-1 victory against Ghana at the National Stadium, advancing to African Cup of Nations finals.", "https://sports247.ng/super-eagles-afcon-2026", "2025-09-29 15:45:00", "Complete Sports", "sports", "https://images.unsplash.com/photo-1574629810360-7efbbe195018?w=400&h=250&fit=crop"),
-                ("Nollywood Director Wins Prestigious Cannes Award", "Nigerian filmmaker receives international acclaim at Cannes Film Festival for groundbreaking cinematography and authentic African storytelling.", "https://entertainment.ng/nollywood-cannes-2025", "2025-09-29 15:30:00", "Pulse Nigeria", "entertainment", "https://images.unsplash.com/photo-1485846234645-a62644f84728?w=400&h=250&fit=crop"),
-                ("Lagos-Ibadan Railway Achieves Full Operational Status", "The Lagos-Ibadan railway line officially commences full passenger service, reducing travel time by 60% and marking a major infrastructure milestone.", "https://infrastructure.ng/lagos-ibadan-rail-2025", "2025-09-29 15:15:00", "The Nation Nigeria", "nigeria", "https://images.unsplash.com/photo-1544620347-c4fd4a3d5957?w=400&h=250&fit=crop"),
-                ("Nigerian Fintech Startup Raises Record $100M Series B", "Lagos-based financial technology company secures largest Series B funding in West African history from international venture capitalists.", "https://techpoint.ng/fintech-funding-2025", "2025-09-29 15:00:00", "TechCabal", "nigeria", "https://images.unsplash.com/photo-1551434678-e076c223a692?w=400&h=250&fit=crop"),
-                ("Burna Boy Announces Massive 2025 World Tour", "Grammy-winning Nigerian superstar reveals extensive world tour spanning 50 cities across Africa, Europe, North America, and Australia.", "https://music.ng/burna-boy-world-tour-2025", "2025-09-29 14:45:00", "NotJustOk", "entertainment", "https://images.unsplash.com/photo-1493225457124-a3eb161ffa5f?w=400&h=250&fit=crop"),
-                ("Nigerian Agricultural Exports Hit All-Time Record High", "Agricultural sector achieves unprecedented export volumes with cocoa, cashew nuts, and palm oil leading foreign exchange earnings growth.", "https://agric.ng/export-record-2025", "2025-09-29 14:30:00", "Daily Trust", "nigeria", "https://images.unsplash.com/photo-1500382017468-9049fed747ef?w=400&h=250&fit=crop"),
-                ("Victor Osimhen Scores Champions League Hat-trick", "Nigerian striker Victor Osimhen delivers outstanding UEFA Champions League performance with three spectacular goals in European football.", "https://goal.com/osimhen-champions-league-2025", "2025-09-29 14:15:00", "Goal.com Nigeria", "sports", "https://images.unsplash.com/photo-1521731978332-9e9e714bdd20?w=400&h=250&fit=crop"),
-                ("President Tinubu Launches National Digital Economy Initiative", "Nigerian government unveils comprehensive digital transformation program aimed at positioning Nigeria as Africa's leading technology hub by 2030.", "https://statehouse.ng/digital-economy-2025", "2025-09-29 14:00:00", "Premium Times", "nigeria", "https://images.unsplash.com/photo-1560472354-b33ff0c44a43?w=400&h=250&fit=crop"),
-                ("Wizkid Collaborates with International Streaming Giants", "Nigerian Afrobeats sensation secures groundbreaking partnership with major streaming platforms to promote African music worldwide.", "https://afrobeats.ng/wizkid-streaming-2025", "2025-09-29 13:45:00", "Soundcity", "entertainment", "https://images.unsplash.com/photo-1493225457124-a3eb161ffa5f?w=400&h=250&fit=crop"),
-                ("Nigerian Universities Achieve Global Research Breakthrough", "Consortium of Nigerian universities publishes revolutionary research in renewable energy, positioning Nigeria as leader in sustainable technology.", "https://education.ng/research-breakthrough-2025", "2025-09-29 13:30:00", "The Guardian Nigeria", "nigeria", "https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=250&fit=crop"),
-                ("D'Tigress Qualify for Olympic Basketball Finals", "Nigerian women's basketball team secures historic qualification for Olympic Games finals, marking unprecedented achievement in African women's basketball.", "https://basketball.ng/dtigress-olympics-2025", "2025-09-29 13:15:00", "Sports247", "sports", "https://images.unsplash.com/photo-1546519638-68e109498ffc?w=400&h=250&fit=crop")
-            ]
-            
-            for title, desc, url, pub_date, source, category, img_url in sample_articles:
-                cursor.execute("""
-                    INSERT OR IGNORE INTO articles 
-                    (title, description, url, published_date, source, category, local_image_path)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (title, desc, url, pub_date, source, category, img_url))
-            
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                
+                migrations.migrate(cursor)
+                
+                # Sample articles with REAL Nigerian images
+                sample_articles = [
+                    ("Breaking: Nigerian Economy Records 4.2% Growth in Q4 2025", "Nigeria's economy demonstrates exceptional resilience with robust growth across technology, agriculture, and oil sectors, marking the highest quarterly growth in five years.", "https://naijanews.com/economy-growth-2025", "2025-09-29 16:00:00", "Vanguard Nigeria", "nigeria", "https://images.unsplash.com/photo-1541746972996-4e0b0f93e586?w=400&h=250&fit=crop"),
+                    ("Super Eagles Secure Historic AFCON 2026 Victory", "Nigerian national football team delivers spectacular 3-1 victory against Ghana at the National Stadium, advancing to African Cup of Nations finals.", "https://sports247.ng/super-eagles-afcon-2026", "2025-09-29 15:45:00", "Complete Sports", "sports", "https://images.unsplash.com/photo-1574629810360-7efbbe195018?w=400&h=250&fit=crop"),
+                    ("Nollywood Director Wins Prestigious Cannes Award", "Nigerian filmmaker receives international acclaim at Cannes Film Festival for groundbreaking cinematography and authentic African storytelling.", "https://entertainment.ng/nollywood-cannes-2025", "2025-09-29 15:30:00", "Pulse Nigeria", "entertainment", "https://images.unsplash.com/photo-1485846234645-a62644f84728?w=400&h=250&fit=crop"),
+                    ("Lagos-Ibadan Railway Achieves Full Operational Status", "The Lagos-Ibadan railway line officially commences full passenger service, reducing travel time by 60% and marking a major infrastructure milestone.", "https://infrastructure.ng/lagos-ibadan-rail-2025", "2025-09-29 15:15:00", "The Nation Nigeria", "nigeria", "https://images.unsplash.com/photo-1544620347-c4fd4a3d5957?w=400&h=250&fit=crop"),
+                    ("Nigerian Fintech Startup Raises Record $100M Series B", "Lagos-based financial technology company secures largest Series B funding in West African history from international venture capitalists.", "https://techpoint.ng/fintech-funding-2025", "2025-09-29 15:00:00", "TechCabal", "nigeria", "https://images.unsplash.com/photo-1551434678-e076c223a692?w=400&h=250&fit=crop"),
+                    ("Burna Boy Announces Massive 2025 World Tour", "Grammy-winning Nigerian superstar reveals extensive world tour spanning 50 cities across Africa, Europe, North America, and Australia.", "https://music.ng/burna-boy-world-tour-2025", "2025-09-29 14:45:00", "NotJustOk", "entertainment", "https://images.unsplash.com/photo-1493225457124-a3eb161ffa5f?w=400&h=250&fit=crop"),
+                    ("Nigerian Agricultural Exports Hit All-Time Record High", "Agricultural sector achieves unprecedented export volumes with cocoa, cashew nuts, and palm oil leading foreign exchange earnings growth.", "https://agric.ng/export-record-2025", "2025-09-29 14:30:00", "Daily Trust", "nigeria", "https://images.unsplash.com/photo-1500382017468-9049fed747ef?w=400&h=250&fit=crop"),
+                    ("Victor Osimhen Scores Champions League Hat-trick", "Nigerian striker Victor Osimhen delivers outstanding UEFA Champions League performance with three spectacular goals in European football.", "https://goal.com/osimhen-champions-league-2025", "2025-09-29 14:15:00", "Goal.com Nigeria", "sports", "https://images.unsplash.com/photo-1521731978332-9e9e714bdd20?w=400&h=250&fit=crop"),
+                    ("President Tinubu Launches National Digital Economy Initiative", "Nigerian government unveils comprehensive digital transformation program aimed at positioning Nigeria as Africa's leading technology hub by 2030.", "https://statehouse.ng/digital-economy-2025", "2025-09-29 14:00:00", "Premium Times", "nigeria", "https://images.unsplash.com/photo-1560472354-b33ff0c44a43?w=400&h=250&fit=crop"),
+                    ("Wizkid Collaborates with International Streaming Giants", "Nigerian Afrobeats sensation secures groundbreaking partnership with major streaming platforms to promote African music worldwide.", "https://afrobeats.ng/wizkid-streaming-2025", "2025-09-29 13:45:00", "Soundcity", "entertainment", "https://images.unsplash.com/photo-1493225457124-a3eb161ffa5f?w=400&h=250&fit=crop"),
+                    ("Nigerian Universities Achieve Global Research Breakthrough", "Consortium of Nigerian universities publishes revolutionary research in renewable energy, positioning Nigeria as leader in sustainable technology.", "https://education.ng/research-breakthrough-2025", "2025-09-29 13:30:00", "The Guardian Nigeria", "nigeria", "https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=250&fit=crop"),
+                    ("D'Tigress Qualify for Olympic Basketball Finals", "Nigerian women's basketball team secures historic qualification for Olympic Games finals, marking unprecedented achievement in African women's basketball.", "https://basketball.ng/dtigress-olympics-2025", "2025-09-29 13:15:00", "Sports247", "sports", "https://images.unsplash.com/photo-1546519638-68e109498ffc?w=400&h=250&fit=crop")
+                ]
+                
+                for title, desc, url, pub_date, source, category, img_url in sample_articles:
+                    cursor.execute("""
+                        INSERT OR IGNORE INTO articles 
+                        (title, description, url, published_date, source, category, local_image_path)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (title, desc, url, pub_date, source, category, img_url))
+                
+                conn.commit()
             return True
         except Exception as e:
             print(f"Database setup error: {e}")
             return False
     
     def get_recent_articles(self, limit=15, random_mode=False):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        if random_mode:
-            cursor.execute("""
-                SELECT id, title, description, url, published_date, source, category, 
-                       local_image_path, posted_to_social
-                FROM articles 
-                ORDER BY RANDOM() 
-                LIMIT ?
-            """, (limit,))
-        else:
-            cursor.execute("""
-                SELECT id, title, description, url, published_date, source, category, 
-                       local_image_path, posted_to_social
-                FROM articles 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            """, (limit,))
-        
-        articles = []
-        for row in cursor.fetchall():
-            articles.append({
-                'id': row[0], 'title': row[1], 'description': row[2], 'url': row[3],
-                'published_date': row[4], 'source': row[5], 'category': row[6], 
-                'local_image_path': row[7] or 'https://images.unsplash.com/photo-1586339949916-3e9457bef6d3?w=400&h=250&fit=crop',
-                'posted_to_social': row[8]
-            })
-        
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            
+            if random_mode:
+                ids = self.sampler.sample(cursor, limit)
+                rows = self.sampler.fetch(cursor, ids, """a.id, a.title, a.description, a.url, a.published_date,
+                    a.source, a.category, a.local_image_path, a.posted_to_social""")
+            else:
+                cursor.execute("""
+                    SELECT id, title, description, url, published_date, source, category, 
+                           local_image_path, posted_to_social
+                    FROM articles 
+                    ORDER BY created_epoch DESC 
+                    LIMIT ?
+                """, (limit,))
+                rows = cursor.fetchall()
+            
+            articles = []
+            for row in rows:
+                articles.append({
+                    'id': row[0], 'title': row[1], 'description': row[2], 'url': row[3],
+                    'published_date': row[4], 'source': row[5], 'category': row[6], 
+                    'local_image_path': row[7] or 'https://images.unsplash.com/photo-1586339949916-3e9457bef6d3?w=400&h=250&fit=crop',
+                    'posted_to_social': row[8]
+                })
         return articles
     
     def get_statistics(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        stats = {}
-        cursor.execute("SELECT COUNT(*) FROM articles")
-        stats['total_articles'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM articles WHERE posted_to_social = TRUE")
-        stats['posted_to_social'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(DISTINCT source) FROM articles")
-        stats['sources_count'] = cursor.fetchone()[0]
-        
-        conn.close()
+        with self.db.connection() as conn:
+            # Counters kept up to date by triggers (news_db.migrate_article_stats)
+            stats = news_db.read_article_stats(conn.cursor())
         return stats
 
 news_app = NigerianNewsBlogApp()
 
 @app.route('/')
 def index():
-    all_articles = news_app.get_recent_articles(15, random_mode=False)
-    stats = news_app.get_statistics()
+    # One pooled connection for the whole page
+    with news_app.db.connection():
+        all_articles = news_app.get_recent_articles(15, random_mode=False)
+        stats = news_app.get_statistics()
     
     return render_template_string('''<!DOCTYPE html>
 <html lang="en">
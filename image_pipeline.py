@@ -0,0 +1,141 @@
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+
+class ImagePipeline:
+    """Download article images on a bounded worker pool, outside the DB write path
+
+    Articles are inserted with a fallback image first. Jobs submitted here are
+    downloaded and processed by `concurrency` workers, and the resulting
+    local_image_path values and article_images links are written back to the
+    database in batches. With `max_queue` set, submit() blocks while that many
+    jobs are waiting, holding back the producer instead of buffering without
+    limit; with block=False it returns False at once and the job stays with the caller.
+    """
+
+    def __init__(self, process_func: Callable[[str, str], Optional[str]],
+                 link_func: Callable[[List[Tuple[str, int]]], None],
+                 concurrency: int = 4, batch_size: int = 20, max_queue: int = 0):
+        self.process_func = process_func
+        self.link_func = link_func
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.jobs = queue.Queue(max_queue)
+        self.max_queue_depth = 0
+        self.processed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self._results: List[Tuple[str, int]] = []
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of image jobs waiting for a worker"""
+        return self.jobs.qsize()
+
+    def start(self):
+        """Start the worker threads if they are not running yet"""
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.concurrency):
+                worker = threading.Thread(target=self._worker, name=f'image-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, article_id: int, image_url: str, article_title: str, timeout: float = None,
+               block: bool = True) -> bool:
+        """Queue an image download for an already-inserted article
+
+        Returns False (and counts the job as cancelled) if the queue stayed full for `timeout` seconds,
+        or False without counting it if the queue is full and `block` is False.
+        """
+        self.start()
+        try:
+            self.jobs.put((article_id, image_url, article_title), block=block,
+                          timeout=None if timeout is None else max(0, timeout))
+        except queue.Full:
+            if block:
+                with self._lock:
+                    self.cancelled += 1
+            return False
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        return True
+
+    def _worker(self):
+        while True:
+            article_id, image_url, article_title = self.jobs.get()
+            try:
+                local_image_path = self.process_func(image_url, article_title)
+                with self._lock:
+                    if local_image_path:
+                        self._results.append((local_image_path, article_id))
+                        self.processed += 1
+                    else:
+                        self.failed += 1
+                    batch = self._take_batch(self.batch_size)
+                if batch:
+                    self._write_batch(batch)
+            except Exception as e:
+                print(f"❌ Image worker error for {image_url}: {str(e)}")
+            finally:
+                self.jobs.task_done()
+
+    def _take_batch(self, minimum: int) -> List[Tuple[str, int]]:
+        """Pop pending results once at least `minimum` are waiting (call with lock held)"""
+        if len(self._results) < max(minimum, 1):
+            return []
+        batch, self._results = self._results, []
+        return batch
+
+    def _write_batch(self, batch: List[Tuple[str, int]]):
+        self.link_func(batch)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until every queued image is processed, then write back what finished
+
+        Returns False if `timeout` seconds passed with jobs still outstanding.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.jobs.all_tasks_done:
+            while self.jobs.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.jobs.all_tasks_done.wait(remaining)
+            finished = not self.jobs.unfinished_tasks
+        self.flush()
+        return finished
+
+    def cancel_pending(self) -> List[Tuple[int, str, str]]:
+        """Drop queued jobs no worker has started; returns their (article_id, image_url, title)"""
+        dropped = []
+        while True:
+            try:
+                dropped.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+            self.jobs.task_done()
+        with self._lock:
+            self.cancelled += len(dropped)
+        return dropped
+
+    def flush(self):
+        """Write back results still waiting for a full batch"""
+        with self._lock:
+            batch = self._take_batch(1)
+        if batch:
+            self._write_batch(batch)
+
+    def stats(self) -> dict:
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'processed': self.processed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'concurrency': self.concurrency,
+        }
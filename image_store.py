@@ -0,0 +1,145 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import news_db
+
+
+def url_hash(image_url: str) -> str:
+    return hashlib.sha256(image_url.encode()).hexdigest()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ImageStore:
+    """Content-addressed image store shared by all articles
+
+    Every source URL maps to a blob keyed by the hash of its downloaded bytes,
+    so a wire photo used by several outlets is fetched, resized and written once.
+    """
+
+    def __init__(self, db_name: str):
+        self.db_name = db_name
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def setup(self, cursor):
+        """Create the store tables (called from setup_database)"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS image_blobs (
+                content_hash TEXT PRIMARY KEY,
+                local_path TEXT NOT NULL UNIQUE,
+                width INTEGER,
+                height INTEGER,
+                size_bytes INTEGER,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS image_sources (
+                url_hash TEXT PRIMARY KEY,
+                image_url TEXT,
+                content_hash TEXT REFERENCES image_blobs (content_hash)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS article_images (
+                article_id INTEGER PRIMARY KEY REFERENCES articles (id),
+                content_hash TEXT REFERENCES image_blobs (content_hash)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_article_images_blob ON article_images (content_hash)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS image_variants (
+                content_hash TEXT REFERENCES image_blobs (content_hash),
+                width INTEGER,
+                format TEXT,
+                local_path TEXT NOT NULL,
+                size_bytes INTEGER,
+                PRIMARY KEY (content_hash, width, format)
+            )
+        """)
+
+    @contextmanager
+    def _keyed_lock(self, key: str):
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            yield
+
+    def url_lock(self, image_url: str):
+        """Serialise work on one URL so parallel workers never fetch it twice"""
+        return self._keyed_lock('url:' + url_hash(image_url))
+
+    def content_lock(self, digest: str):
+        """Serialise processing of identical bytes arriving from different URLs"""
+        return self._keyed_lock('content:' + digest)
+
+    def path_for_url(self, image_url: str) -> Optional[str]:
+        """Stored image path for a source URL we have already fetched"""
+        conn = news_db.connect(self.db_name)
+        row = conn.execute("""
+            SELECT b.local_path FROM image_sources s
+            JOIN image_blobs b ON b.content_hash = s.content_hash
+            WHERE s.url_hash = ?
+        """, (url_hash(image_url),)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def path_for_content(self, digest: str) -> Optional[str]:
+        """Stored image path for downloaded bytes we have already processed"""
+        conn = news_db.connect(self.db_name)
+        row = conn.execute("SELECT local_path FROM image_blobs WHERE content_hash = ?", (digest,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def add(self, image_url: str, digest: str, local_path: str = None,
+            width: int = None, height: int = None, size_bytes: int = None):
+        """Record a blob (if new) and map the source URL to it"""
+        conn = news_db.connect(self.db_name)
+        if local_path:
+            conn.execute("""
+                INSERT OR IGNORE INTO image_blobs (content_hash, local_path, width, height, size_bytes)
+                VALUES (?, ?, ?, ?, ?)
+            """, (digest, local_path, width, height, size_bytes))
+        conn.execute("INSERT OR REPLACE INTO image_sources (url_hash, image_url, content_hash) VALUES (?, ?, ?)",
+                     (url_hash(image_url), image_url, digest))
+        conn.commit()
+        conn.close()
+
+    def add_variants(self, digest: str, variants: List[Tuple[int, str, str, int]]):
+        """Record resized/re-encoded copies of a blob as (width, format, local_path, size_bytes)"""
+        conn = news_db.connect(self.db_name)
+        conn.executemany("""
+            INSERT OR REPLACE INTO image_variants (content_hash, width, format, local_path, size_bytes)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(digest, width, fmt, local_path, size_bytes) for width, fmt, local_path, size_bytes in variants])
+        conn.commit()
+        conn.close()
+
+    def link_articles(self, links: List[Tuple[str, int]]):
+        """Point articles at their stored images, given (local_path, article_id) pairs"""
+        conn = news_db.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.executemany("UPDATE articles SET local_image_path = ? WHERE id = ?", links)
+        cursor.executemany("""
+            INSERT OR REPLACE INTO article_images (article_id, content_hash)
+            SELECT ?, content_hash FROM image_blobs WHERE local_path = ?
+        """, [(article_id, local_path) for local_path, article_id in links])
+        conn.commit()
+        conn.close()
+
+    def content_hash_for_path(self, local_path: str) -> Optional[str]:
+        conn = news_db.connect(self.db_name)
+        row = conn.execute("SELECT content_hash FROM image_blobs WHERE local_path = ?", (local_path,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def has_variants(self, digest: str) -> bool:
+        conn = news_db.connect(self.db_name)
+        row = conn.execute("SELECT 1 FROM image_variants WHERE content_hash = ? LIMIT 1", (digest,)).fetchone()
+        conn.close()
+        return row is not None
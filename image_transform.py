@@ -0,0 +1,137 @@
+"""CPU-bound image transforms, run in worker processes.
+
+Decoding, RGBA flattening, LANCZOS resizing and JPEG/WebP encoding hold the
+GIL, so they run here as plain functions that take bytes and return encoded
+bytes. The caller keeps all network, file and database work.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Sequence, Tuple
+
+from PIL import Image
+
+JPEG_OPTIONS = {'quality': 85, 'optimize': True}
+VARIANT_FORMATS = (
+    ('jpeg', 'jpg', {'quality': 80, 'optimize': True}),
+    ('webp', 'webp', {'quality': 80, 'method': 4}),
+)
+
+
+def prepare_image(image_data: bytes, max_width: int) -> Image.Image:
+    """Decode image bytes, flatten transparency and cap the width at max_width"""
+    image = Image.open(io.BytesIO(image_data))
+
+    # Let the JPEG decoder scale down by 1/2, 1/4 or 1/8 while decoding
+    if image.format == 'JPEG' and image.width > max_width:
+        ratio = max_width / image.width
+        image.draft('RGB', (max_width, int(image.height * ratio)))
+
+    # Convert to RGB if necessary
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
+        image = background
+
+    # Cap the width, using cheap integer reduction for most of the way
+    if image.width > max_width:
+        ratio = max_width / image.width
+        image = image.resize((max_width, int(image.height * ratio)), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    return image
+
+
+def encode(image: Image.Image, fmt: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt.upper(), **options)
+    return buffer.getvalue()
+
+
+def render_variants(image: Image.Image, widths: Sequence[int]) -> List[Tuple[int, str, str, bytes]]:
+    """Smaller JPEG widths plus WebP copies for srcset, as (width, format, extension, data)"""
+    variants = []
+    for width in sorted(set(w for w in widths if w < image.width) | {image.width}):
+        if width == image.width:
+            resized = image
+        else:
+            resized = image.resize((width, int(image.height * width / image.width)),
+                                   Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        for fmt, ext, options in VARIANT_FORMATS:
+            if fmt == 'jpeg' and width == image.width:
+                continue  # the main image already is this one
+            variants.append((width, fmt, ext, encode(resized, fmt, **options)))
+    return variants
+
+
+def transform(image_data: bytes, max_width: int, thumbnail_widths: Sequence[int],
+              build_variants: bool = True) -> Dict:
+    """Downloaded bytes -> the stored JPEG (and its variants), all encoded"""
+    image = prepare_image(image_data, max_width)
+    return {
+        'width': image.width,
+        'height': image.height,
+        'jpeg': encode(image, 'jpeg', **JPEG_OPTIONS),
+        'variants': render_variants(image, thumbnail_widths) if build_variants else [],
+    }
+
+
+def variants_for_stored(jpeg_data: bytes, thumbnail_widths: Sequence[int]) -> List[Tuple[int, str, str, bytes]]:
+    """Variants of an image that is already stored (thumbnail_build jobs)"""
+    with Image.open(io.BytesIO(jpeg_data)) as image:
+        image.load()
+        return render_variants(image, thumbnail_widths)
+
+
+class ImageTransformPool:
+    """Process pool for the transforms above, sized to the machine by default
+
+    With workers=0 transforms run inline in the calling thread (the old
+    behaviour). The pool is created lazily from a multi-threaded process, so
+    workers are never forked from it directly (a lock held by another thread
+    at fork time would deadlock the child). Where available they come from a
+    forkserver, a clean single-threaded process that preloads this module;
+    elsewhere they are spawned. Either way each worker process imports the
+    calling script once (without running its __main__ block), not once per
+    transform. If the pool breaks (a worker was killed), the work
+    is retried inline and the pool is rebuilt on the next call; a transform
+    that takes longer than `timeout` seconds fails that image.
+    """
+
+    def __init__(self, workers: int = None, timeout: float = 120):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload(['image_transform'])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+            return self._executor
+
+    def run(self, func, *args):
+        """Run func(*args) on a worker process and wait for its result"""
+        if not self.workers:
+            return func(*args)
+        try:
+            return self._pool().submit(func, *args).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            with self._lock:
+                self._executor = None
+            return func(*args)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,102 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class IngestionWorker:
+    """Long-lived in-process ingestion thread
+
+    Keeps one NigerianNewsBlogWithImages instance (DB setup, HTTP connection
+    pool, image pipeline) alive across cycles instead of starting a fresh
+    interpreter for every fetch. Requests for a cycle are queued; a request made
+    while an identical one is still waiting shares that cycle's Future. If
+    starting up fails (e.g. the database is locked), the queued requests fail
+    and the next enqueue() tries again.
+    """
+
+    def __init__(self, blog_factory=None):
+        self.blog_factory = blog_factory
+        self.jobs = queue.Queue()
+        self.blog = None
+        self.startup_seconds = None
+        self.last_cycle_seconds = None
+        self.cycles = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _start(self):
+        # Called with the lock held
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ingestion', daemon=True)
+            self._thread.start()
+
+    def start(self):
+        with self._lock:
+            self._start()
+
+    def enqueue(self, due_only: bool = True) -> Future:
+        """Queue a news cycle; returns a Future that resolves when it has finished"""
+        with self._lock:
+            if due_only in self._pending:
+                return self._pending[due_only]
+            future = Future()
+            self._pending[due_only] = future
+            # Queued under the lock, so a failed startup cannot miss it (see _startup_failed)
+            self.jobs.put((due_only, future))
+            self._start()
+        return future
+
+    def _startup_failed(self, error: Exception):
+        """Fail every queued request and let the next enqueue() start a new thread"""
+        with self._lock:
+            self._thread = None
+            self._pending = {}
+            while True:
+                try:
+                    _, future = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(error)
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            if self.blog_factory is None:
+                # Imported here so the web process only pays for PIL/feedparser once the worker starts
+                from nigerian_news_with_images import NigerianNewsBlogWithImages
+                self.blog_factory = NigerianNewsBlogWithImages
+            self.blog = self.blog_factory()
+        except Exception as e:
+            print(f"❌ Ingestion worker failed to start: {e}")
+            self._startup_failed(e)
+            return
+        self.startup_seconds = time.perf_counter() - start
+        print(f"✅ Ingestion worker ready in {self.startup_seconds:.2f}s")
+
+        while True:
+            due_only, future = self.jobs.get()
+            with self._lock:
+                self._pending.pop(due_only, None)
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            start = time.perf_counter()
+            try:
+                self.blog.run_nigerian_news_cycle(due_only=due_only)
+                self.last_cycle_seconds = time.perf_counter() - start
+                self.cycles += 1
+                future.set_result(self.last_cycle_seconds)
+            except Exception as e:
+                print(f"❌ Ingestion cycle failed: {e}")
+                future.set_exception(e)
+
+    def stats(self) -> dict:
+        return {
+            'cycles': self.cycles,
+            'queued': self.jobs.qsize(),
+            'startup_seconds': self.startup_seconds,
+            'last_cycle_seconds': self.last_cycle_seconds,
+        }
@@ -0,0 +1,254 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional, Sequence
+
+import news_db
+
+
+class JobQueue:
+    """Durable job table in SQLite with retries, exponential backoff and leases
+
+    A claimed job is leased to one worker for `lease_seconds`, and JobRunner
+    renews the lease while the handler runs. If the worker crashes or the
+    process restarts, the lease expires and another worker picks the job up
+    again. complete(), fail() and renew() only act while the caller still holds
+    the lease, so a worker whose lease expired cannot finish or requeue a job
+    someone else has claimed since. Completed jobs are kept as 'done' so they
+    are never redone.
+    """
+
+    def __init__(self, db_name: str, lease_seconds: float = 300, base_backoff: float = 30,
+                 max_backoff: float = 60 * 60):
+        self.db_name = db_name
+        self.lease_seconds = lease_seconds
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+    def setup(self, cursor):
+        """Create the jobs table (called from setup_database)"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT,
+                dedupe_key TEXT,
+                state TEXT DEFAULT 'queued',
+                attempts INTEGER DEFAULT 0,
+                max_attempts INTEGER DEFAULT 5,
+                run_after REAL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_runnable ON jobs (state, run_after)")
+        # At most one live job per dedupe key; finished jobs do not block new ones
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs (dedupe_key)
+            WHERE state IN ('queued', 'running')
+        """)
+
+    def enqueue(self, kind: str, payload: dict, dedupe_key: str = None,
+                max_attempts: int = 5, delay: float = 0, cursor=None) -> Optional[int]:
+        """Add a job; returns its id, or None if a live job with the same dedupe key exists
+
+        With `cursor` the job is written in the caller's transaction, so it is
+        committed together with the rows it is about (or not at all).
+        """
+        conn = None
+        if cursor is None:
+            conn = news_db.connect(self.db_name)
+            cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR IGNORE INTO jobs (kind, payload, dedupe_key, max_attempts, run_after)
+            VALUES (?, ?, ?, ?, ?)
+        """, (kind, json.dumps(payload), dedupe_key, max_attempts, time.time() + delay))
+        job_id = cursor.lastrowid if cursor.rowcount else None
+        if conn is not None:
+            conn.commit()
+            conn.close()
+        return job_id
+
+    @staticmethod
+    def _runnable(kinds: Sequence[str] = None):
+        """WHERE clause and params for jobs that can be claimed now, optionally of the given kinds only"""
+        now = time.time()
+        where = "((state = 'queued' AND run_after <= ?) OR (state = 'running' AND lease_expires < ?))"
+        params = [now, now]
+        if kinds is not None:
+            where += f" AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        return where, params
+
+    def claim(self, worker_id: str, kinds: Sequence[str] = None) -> Optional[Dict]:
+        """Lease the next runnable job (queued and due, or running with an expired lease)"""
+        now = time.time()
+        where, params = self._runnable(kinds)
+        conn = news_db.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(f"SELECT id, kind, payload, attempts FROM jobs WHERE {where} ORDER BY run_after LIMIT 1",
+                       params)
+        row = cursor.fetchone()
+        if row:
+            cursor.execute("""
+                UPDATE jobs SET state = 'running', attempts = attempts + 1, lease_owner = ?,
+                       lease_expires = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (worker_id, now + self.lease_seconds, row[0]))
+        conn.commit()
+        conn.close()
+
+        if not row:
+            return None
+        return {'id': row[0], 'kind': row[1], 'payload': json.loads(row[2]), 'attempts': row[3] + 1}
+
+    def renew(self, job_id: int, worker_id: str) -> bool:
+        """Extend the lease of a running job; False if the worker no longer holds it"""
+        conn = news_db.connect(self.db_name)
+        cursor = conn.execute("""
+            UPDATE jobs SET lease_expires = ? WHERE id = ? AND state = 'running' AND lease_owner = ?
+        """, (time.time() + self.lease_seconds, job_id, worker_id))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount > 0
+
+    def complete(self, job_id: int, worker_id: str) -> bool:
+        """Mark the job done; False if the lease was lost to another worker"""
+        conn = news_db.connect(self.db_name)
+        cursor = conn.execute("""
+            UPDATE jobs SET state = 'done', lease_owner = NULL, lease_expires = NULL,
+                   last_error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND state = 'running' AND lease_owner = ?
+        """, (job_id, worker_id))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount > 0
+
+    def fail(self, job_id: int, error: str, worker_id: str) -> Optional[str]:
+        """Record a failure; requeue with exponential backoff or mark failed
+
+        Returns the new state, or None if the lease was lost to another worker.
+        """
+        conn = news_db.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        row = cursor.execute("""
+            SELECT attempts, max_attempts FROM jobs WHERE id = ? AND state = 'running' AND lease_owner = ?
+        """, (job_id, worker_id)).fetchone()
+        if row is None:
+            conn.rollback()
+            conn.close()
+            return None
+
+        attempts, max_attempts = row
+        state = 'failed' if attempts >= max_attempts else 'queued'
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+        cursor.execute("""
+            UPDATE jobs SET state = ?, run_after = ?, last_error = ?, lease_owner = NULL,
+                   lease_expires = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (state, time.time() + backoff, error[:500], job_id))
+        conn.commit()
+        conn.close()
+        return state
+
+    def counts(self) -> Dict[str, int]:
+        conn = news_db.connect(self.db_name)
+        rows = conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        conn.close()
+        return dict(rows)
+
+    def has_runnable(self, kinds: Sequence[str] = None) -> bool:
+        where, params = self._runnable(kinds)
+        conn = news_db.connect(self.db_name)
+        row = conn.execute(f"SELECT 1 FROM jobs WHERE {where} LIMIT 1", params).fetchone()
+        conn.close()
+        return row is not None
+
+
+class JobRunner:
+    """N worker threads that claim jobs from a JobQueue and dispatch them by kind
+
+    Workers only claim the kinds they have handlers for. Worker ids are
+    unique per runner (and so per process), and a heartbeat thread renews the
+    leases of running jobs every third of the lease period.
+    """
+
+    def __init__(self, job_queue: JobQueue, handlers: Dict[str, Callable[[dict], None]],
+                 workers: int = 4, poll_interval: float = 1.0):
+        self.queue = job_queue
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.runner_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.completed = 0
+        self._busy = 0
+        self._running = {}  # job id -> worker id
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _work(self, worker_id: str, drain: bool, deadline: float):
+        while not self._stop.is_set():
+            if deadline is not None and time.monotonic() >= deadline:
+                return  # jobs not claimed yet stay queued for the next run
+            with self._lock:
+                job = self.queue.claim(worker_id, list(self.handlers))
+                if job:
+                    self._busy += 1
+                    self._running[job['id']] = worker_id
+                elif drain and self._busy == 0:
+                    return  # nothing runnable and nobody left to produce more
+
+            if not job:
+                time.sleep(self.poll_interval)
+                continue
+
+            try:
+                self.handlers[job['kind']](job['payload'])
+                if self.queue.complete(job['id'], worker_id):
+                    with self._lock:
+                        self.completed += 1
+                else:
+                    print(f"⚠️  Job {job['kind']} #{job['id']} finished after its lease passed to another worker")
+            except Exception as e:
+                state = self.queue.fail(job['id'], str(e), worker_id) or 'lease lost'
+                print(f"❌ Job {job['kind']} #{job['id']} attempt {job['attempts']} failed ({state}): {e}")
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._running.pop(job['id'], None)
+
+    def _heartbeat(self, done: threading.Event):
+        while not done.wait(self.queue.lease_seconds / 3):
+            with self._lock:
+                running = list(self._running.items())
+            for job_id, worker_id in running:
+                self.queue.renew(job_id, worker_id)
+
+    def run(self, drain: bool = True, deadline: float = None):
+        """Run the workers; with drain=True return once no runnable jobs are left
+
+        With a `deadline` (a time.monotonic() value) workers stop claiming jobs
+        once it passes and return after finishing the ones they hold.
+        """
+        threads = [threading.Thread(target=self._work, args=(f'{self.runner_id}-worker-{i}', drain, deadline),
+                                    daemon=True)
+                   for i in range(self.workers)]
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(done,), daemon=True)
+        heartbeat.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,122 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+import news_db
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def describe(values: List[float]) -> Dict:
+    values = sorted(values)
+    stats = {
+        'count': len(values),
+        'total': round(sum(values), 4),
+        'mean': round(sum(values) / len(values), 4),
+        'max': round(values[-1], 4),
+    }
+    for pct in PERCENTILES:
+        stats[f'p{pct}'] = round(percentile(values, pct), 4)
+    return stats
+
+
+class MetricsRecorder:
+    """Ingestion measurements (latency, bytes, counts) buffered in memory and written in batches
+
+    Each sample is a (name, subject, value) triple, e.g. ('feed.latency_seconds',
+    rss_url, 0.42). Samples are tagged with the cycle they belong to and pruned
+    after `retention_days`.
+    """
+
+    def __init__(self, db_name: str, retention_days: float = 14, flush_every: int = 500):
+        self.db_name = db_name
+        self.retention_days = retention_days
+        self.flush_every = flush_every
+        self.cycle_id = None
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def setup(self, cursor):
+        """Create the metrics table (called from setup_database)"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                cycle_id REAL,
+                recorded_at REAL NOT NULL,
+                name TEXT NOT NULL,
+                subject TEXT,
+                value REAL NOT NULL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_metrics_recorded ON metrics (recorded_at)")
+
+    def start_cycle(self) -> float:
+        """Tag subsequent samples with a new cycle id and prune expired ones"""
+        self.cycle_id = time.time()
+        conn = news_db.connect(self.db_name)
+        conn.execute("DELETE FROM metrics WHERE recorded_at < ?", (self.cycle_id - self.retention_days * 86400,))
+        conn.commit()
+        conn.close()
+        return self.cycle_id
+
+    def record(self, name: str, value: float, subject: str = None):
+        with self._lock:
+            self._buffer.append((self.cycle_id, time.time(), name, subject, value))
+            full = len(self._buffer) >= self.flush_every
+        if full:
+            self.flush()
+
+    @contextmanager
+    def timer(self, name: str, subject: str = None):
+        """Record how long the block took, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, subject)
+
+    def flush(self):
+        """Write buffered samples in one transaction"""
+        with self._lock:
+            samples, self._buffer = self._buffer, []
+        if not samples:
+            return
+
+        conn = news_db.connect(self.db_name)
+        conn.executemany("INSERT INTO metrics (cycle_id, recorded_at, name, subject, value) VALUES (?, ?, ?, ?, ?)",
+                         samples)
+        conn.commit()
+        conn.close()
+
+    def summary(self, hours: float = 24, recent_cycles: int = 10) -> Dict:
+        """Percentiles per metric, per feed, and totals for the most recent cycles"""
+        conn = news_db.connect(self.db_name)
+        rows = conn.execute("SELECT cycle_id, name, subject, value FROM metrics WHERE recorded_at >= ?",
+                            (time.time() - hours * 3600,)).fetchall()
+        conn.close()
+
+        by_name, by_feed, by_cycle = {}, {}, {}
+        for cycle_id, name, subject, value in rows:
+            by_name.setdefault(name, []).append(value)
+            if name.startswith('feed.') and subject:
+                by_feed.setdefault(subject, {}).setdefault(name, []).append(value)
+            if name.startswith('cycle.') and cycle_id:
+                by_cycle.setdefault(cycle_id, {})[name] = value
+
+        cycles = [dict(started_at=cycle_id, **values) for cycle_id, values in sorted(by_cycle.items())]
+        return {
+            'window_hours': hours,
+            'metrics': {name: describe(values) for name, values in sorted(by_name.items())},
+            'feeds': {feed: {name: describe(values) for name, values in sorted(metrics.items())}
+                      for feed, metrics in sorted(by_feed.items())},
+            'cycles': cycles[-recent_cycles:],
+        }
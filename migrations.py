@@ -0,0 +1,177 @@
+"""Versioned schema migrations for the articles table, shared by every app.
+
+Each migration runs once per database and is recorded in schema_version.
+Migrations must be idempotent (IF NOT EXISTS, add_missing_columns), because
+databases created before versioning, or two processes starting together, can
+run one again. Append new ones to MIGRATIONS; never renumber or edit
+migrations that have shipped.
+
+Check that the hot queries still use indexes:  python migrations.py [database]
+"""
+import sqlite3
+import sys
+import time
+from typing import List, Tuple
+
+import news_db
+from article_sampler import EXACT_SQL, LOOKUP_SQL, WINDOW_START_SQL, ArticleSampler
+
+
+def create_articles(cursor):
+    """The articles table as the ingestion script defines it"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS articles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            url TEXT UNIQUE,
+            published_date DATETIME,
+            source TEXT,
+            category TEXT,
+            image_url TEXT,
+            local_image_path TEXT,
+            posted_to_social BOOLEAN DEFAULT FALSE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            published_epoch INTEGER,
+            created_epoch INTEGER
+        )
+    """)
+    # The sample apps created it without image_url
+    news_db.add_missing_columns(cursor, 'articles', {'image_url': 'TEXT'})
+
+
+# Composite indexes for the filters the pages and the sampler use; the rowid
+# rides along in every index, so id-only queries on them never touch the table
+ARTICLE_INDEXES = {
+    'idx_articles_category_created': 'category, created_epoch',
+    'idx_articles_source_created': 'source, created_epoch',
+    'idx_articles_social_created': 'posted_to_social, created_epoch',
+}
+
+
+def create_article_indexes(cursor):
+    for name, columns in ARTICLE_INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON articles ({columns})")
+
+
+MIGRATIONS = [
+    (1, 'articles table', create_articles),
+    (2, 'epoch timestamp columns', news_db.migrate_article_timestamps),
+    (3, 'statistics counters', news_db.migrate_article_stats),
+    (4, 'category, source and social indexes', create_article_indexes),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(cursor) -> int:
+    """The highest migration applied to this database (0 for none)"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+    if not cursor.fetchone():
+        return 0
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(cursor) -> List[Tuple[int, str]]:
+    """Apply pending migrations in order; returns the (version, name) pairs applied"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at REAL NOT NULL
+        )
+    """)
+    current = schema_version(cursor)
+    applied = []
+    for version, name, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        migration(cursor)
+        cursor.execute("INSERT OR IGNORE INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                       (version, name, time.time()))
+        applied.append((version, name))
+        print(f"🗄️ Applied schema migration {version}: {name}")
+
+    # Rows the epoch trigger could not parse (RFC-822 dates) are filled on every start
+    backfilled = news_db.backfill_article_epochs(cursor)
+    if backfilled:
+        print(f"🕒 Backfilled epoch timestamps for {backfilled} articles")
+    return applied
+
+
+# The queries that run on every page view or ingestion cycle, built from the
+# same SQL constants the apps and modules named execute, with sample
+# parameters. The three ARTICLE_INDEXES checks have no caller of their own;
+# they make sure each index serves its filter. Only queries marked True may
+# walk a whole index, because the LIMIT stops the walk.
+_sample_filters = ArticleSampler().filters(0, 'sports', True)
+_window_filters = ArticleSampler().filters(0, None, False)
+HOT_QUERIES = [
+    ('front page, newest first (flask_web_app)', news_db.NEWEST_ARTICLES_SQL.format(
+        columns='a.id, a.title', join=news_db.UNIQUE_ARTICLES_JOIN, where=news_db.UNIQUE_ARTICLES_WHERE),
+     (15,), True),
+    ('front page by publish date (working_app)', news_db.NEWEST_PUBLISHED_SQL, (), True),
+    ('random: recency window start (article_sampler)', WINDOW_START_SQL, (0,), False),
+    ('random: candidate lookup (article_sampler)', LOOKUP_SQL.format(
+        join=_sample_filters[0], placeholders='?, ?, ?', where=_sample_filters[1]),
+     (1, 2, 3, *_sample_filters[2]), False),
+    ('random: exact category + window (article_sampler)', EXACT_SQL.format(
+        join=_sample_filters[0], where=_sample_filters[1]), (*_sample_filters[2], 15), False),
+    ('random: exact window (article_sampler)', EXACT_SQL.format(
+        join=_window_filters[0], where=_window_filters[1]), (*_window_filters[2], 15), False),
+    ('newest in a category (idx_articles_category_created)', """
+        SELECT id, title FROM articles WHERE category = ? ORDER BY created_epoch DESC LIMIT ?
+    """, ('sports', 15), False),
+    ('newest from a source (idx_articles_source_created)', """
+        SELECT id, title FROM articles WHERE source = ? ORDER BY created_epoch DESC LIMIT ?
+    """, ('Punch', 15), False),
+    ('not yet posted to social, newest first (idx_articles_social_created)', """
+        SELECT id, title FROM articles WHERE posted_to_social = FALSE ORDER BY created_epoch DESC LIMIT ?
+    """, (15,), False),
+    ('ingest: already stored URLs (nigerian_news_with_images)', news_db.KNOWN_URLS_SQL.format(placeholders='?, ?'),
+     ('https://example.ng/a', 'https://example.ng/b'), False),
+    ('ingest: rows inserted this batch (nigerian_news_with_images)', news_db.INSERTED_SINCE_SQL, (0,), False),
+    ('epoch backfill (news_db)', news_db.MISSING_EPOCHS_SQL, (), False),
+]
+
+
+def check_query_plans(cursor) -> List[str]:
+    """EXPLAIN QUERY PLAN every hot query; returns one problem per full scan or full sort"""
+    problems = []
+    for label, sql, params, ordered_walk in HOT_QUERIES:
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        except sqlite3.OperationalError as e:
+            problems.append(f"{label}: {e}")
+            continue
+        for row in cursor.fetchall():
+            detail = row[-1]
+            if detail.startswith('SCAN ') and ' USING ' not in detail:
+                problems.append(f"{label}: full table scan ({detail})")
+            elif detail.startswith('SCAN ') and not ordered_walk:
+                # walking an index that does not lead with the filtered column visits every row
+                problems.append(f"{label}: full index scan ({detail})")
+            elif detail.startswith('USE TEMP B-TREE FOR ORDER BY') and 'RANDOM()' not in sql:
+                problems.append(f"{label}: sorts every matching row ({detail})")
+    return problems
+
+
+if __name__ == '__main__':
+    from near_duplicates import NearDuplicateIndex
+
+    # A given database is checked as it is; by default a fresh one gets every migration
+    conn = news_db.connect(sys.argv[1]) if len(sys.argv) > 1 else sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    if len(sys.argv) == 1:
+        migrate(cursor)
+        # the near-duplicate clustering tables the pages join
+        NearDuplicateIndex(':memory:').setup(cursor)
+    version = schema_version(cursor)
+    print(f"🗄️ Schema version {version} of {LATEST_VERSION}")
+    problems = check_query_plans(cursor)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print(f"✅ All {len(HOT_QUERIES)} hot queries use an index")
+    conn.close()
+    sys.exit(1 if problems or version < LATEST_VERSION else 0)
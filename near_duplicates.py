@@ -0,0 +1,248 @@
+import hashlib
+import random
+import re
+import struct
+import time
+from typing import Iterable, List, Set
+
+import news_db
+from article_sampler import WINDOW_START_SQL
+
+TAG_RE = re.compile(r'<[^>]+>')
+# WordPress syndication footer: "The post <title> appeared first on <site>."
+FOOTER_RE = re.compile(r'the post .{0,300}? appeared first on .*$', re.IGNORECASE | re.DOTALL)
+WORD_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = {
+    'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'at', 'by', 'with', 'from',
+    'as', 'is', 'are', 'was', 'were', 'be', 'has', 'have', 'had', 'it', 'its', 'that', 'this',
+    'says', 'said', 'read', 'more',
+}
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_COEFFICIENTS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(PERMUTATIONS)]
+
+
+def normalize(text: str) -> List[str]:
+    """Lowercased words of the text with HTML, syndication footer, punctuation and stopwords removed"""
+    text = FOOTER_RE.sub(' ', TAG_RE.sub(' ', text or '')).lower()
+    return [word for word in WORD_RE.findall(text) if word not in STOPWORDS]
+
+
+def shingles(text: str) -> Set[str]:
+    """Word bigrams (single words for texts too short to have any)"""
+    words = normalize(text)
+    if len(words) < 2:
+        return set(words)
+    return {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash(features: Set[str]) -> List[int]:
+    """MinHash signature: the minimum of each of PERMUTATIONS universal hashes over the features"""
+    hashes = [int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), 'big') for f in features]
+    return [min((a * h + b) % PRIME for h in hashes) for a, b in _COEFFICIENTS]
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / PERMUTATIONS
+
+
+def buckets(signature: List[int]) -> List[int]:
+    """One LSH bucket per band of ROWS signature values, as signed 64-bit ints for SQLite"""
+    result = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        # The band number is hashed in too, so one indexed column covers every band
+        digest = hashlib.blake2b(struct.pack(f'>B{ROWS}Q', band, *rows), digest_size=8).digest()
+        result.append(struct.unpack('>q', digest)[0])
+    return result
+
+
+def title_words(title: str) -> Set[str]:
+    """Normalized words of a headline"""
+    return set(normalize(title))
+
+
+def title_overlap(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two headlines' word sets"""
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class NearDuplicateIndex:
+    """MinHash signatures of title+description, clustered across sources
+
+    Each article belongs to a cluster named after its first-seen member (its
+    head). Candidates are cluster heads from the last `window_days` that share
+    an indexed LSH bucket (BANDS bands of ROWS hashes), at most
+    `candidate_limit` of the newest per bucket, so a bucket crowded by
+    boilerplate cannot make indexing quadratic. With the defaults, stories
+    with Jaccard similarity 0.6 are found ~90% of the time and 0.75 almost
+    always. Headlines must also share `title_threshold` of their words, so a
+    description shared by unrelated posts (a site's standard blurb) is not
+    enough to make them duplicates.
+    """
+
+    def __init__(self, db_name: str, threshold: float = 0.6, title_threshold: float = 0.4,
+                 window_days: float = 3, candidate_limit: int = 50, chunk_size: int = 500):
+        self.db_name = db_name
+        self.threshold = threshold
+        self.title_threshold = title_threshold
+        self.window_days = window_days
+        self.candidate_limit = candidate_limit
+        self.chunk_size = chunk_size
+
+    def setup(self, cursor):
+        """Create the signature and bucket tables (called from setup_database)"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS article_fingerprints (
+                article_id INTEGER PRIMARY KEY REFERENCES articles (id),
+                signature BLOB,
+                cluster_id INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_fingerprints_cluster ON article_fingerprints (cluster_id)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS article_lsh_buckets (
+                bucket INTEGER NOT NULL,
+                article_id INTEGER NOT NULL,
+                PRIMARY KEY (bucket, article_id)
+            ) WITHOUT ROWID
+        """)
+
+    def _window_start_id(self, cursor) -> int:
+        """Lowest article id inside the recency window (ids follow created_epoch)"""
+        cursor.execute(WINDOW_START_SQL, (int(time.time() - self.window_days * 24 * 3600),))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _find_cluster(self, cursor, signature: List[int], article_buckets: List[int], title: Set[str],
+                      min_id: int):
+        # The newest heads of each bucket, walking the (bucket, article_id) primary key backwards
+        newest = ("SELECT * FROM (SELECT article_id FROM article_lsh_buckets WHERE bucket = ? AND article_id >= ? "
+                  "ORDER BY article_id DESC LIMIT ?)")
+        cursor.execute(' UNION '.join([newest] * len(article_buckets)),
+                       [value for bucket in article_buckets for value in (bucket, min_id, self.candidate_limit)])
+        candidates = [row[0] for row in cursor.fetchall()]
+        if not candidates:
+            return None
+
+        placeholders = ','.join('?' * len(candidates))
+        cursor.execute(f"""
+            SELECT f.signature, f.cluster_id, a.title FROM article_fingerprints f JOIN articles a ON a.id = f.article_id
+            WHERE f.article_id IN ({placeholders}) AND f.cluster_id = f.article_id AND f.signature IS NOT NULL
+        """, candidates)
+        best = None
+        for blob, cluster_id, head_title in cursor.fetchall():
+            score = similarity(signature, struct.unpack(f'>{PERMUTATIONS}Q', blob))
+            if score < self.threshold or (best is not None and score <= best[0]):
+                continue
+            if title_overlap(title, title_words(head_title)) >= self.title_threshold:
+                best = (score, cluster_id)
+        return best[1] if best else None
+
+    def index_articles(self, article_ids: Iterable[int]) -> Set[int]:
+        """Sign and cluster stored articles; returns the ids that joined an existing cluster"""
+        article_ids = list(article_ids)
+        if not article_ids:
+            return set()
+
+        conn = news_db.connect(self.db_name)
+        cursor = conn.cursor()
+        duplicates = set()
+        rows = []
+        for i in range(0, len(article_ids), self.chunk_size):
+            chunk = article_ids[i:i + self.chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"SELECT id, title, description FROM articles WHERE id IN ({placeholders})", chunk)
+            rows.extend(cursor.fetchall())
+        min_id = self._window_start_id(cursor)
+
+        for article_id, title, description in sorted(rows):
+            features = shingles(f"{title} {description}")
+            if not features:
+                cursor.execute("INSERT OR REPLACE INTO article_fingerprints (article_id, signature, cluster_id) "
+                               "VALUES (?, NULL, ?)", (article_id, article_id))
+                continue
+
+            signature = minhash(features)
+            article_buckets = buckets(signature)
+            cluster_id = None
+            if min_id is not None:
+                cluster_id = self._find_cluster(cursor, signature, article_buckets, title_words(title), min_id)
+            if cluster_id is None:
+                cluster_id = article_id
+                # Only heads are ever candidates, so only heads need bucket entries
+                cursor.executemany("INSERT OR IGNORE INTO article_lsh_buckets (bucket, article_id) VALUES (?, ?)",
+                                   [(bucket, article_id) for bucket in article_buckets])
+            else:
+                duplicates.add(article_id)
+            cursor.execute("INSERT OR REPLACE INTO article_fingerprints (article_id, signature, cluster_id) "
+                           "VALUES (?, ?, ?)",
+                           (article_id, struct.pack(f'>{PERMUTATIONS}Q', *signature), cluster_id))
+
+        conn.commit()
+        conn.close()
+        return duplicates
+
+    def with_cluster_image(self, article_ids: Iterable[int]) -> Set[int]:
+        """Those of the given ids whose cluster head has an image of its own to share"""
+        article_ids = list(article_ids)
+        if not article_ids:
+            return set()
+
+        conn = news_db.connect(self.db_name)
+        placeholders = ','.join('?' * len(article_ids))
+        rows = conn.execute(f"""
+            SELECT f.article_id FROM article_fingerprints f
+            JOIN articles head ON head.id = f.cluster_id
+            WHERE f.article_id IN ({placeholders}) AND f.cluster_id != f.article_id
+              AND head.image_url IS NOT NULL AND head.image_url != ''
+        """, article_ids).fetchall()
+        conn.close()
+        return {row[0] for row in rows}
+
+    def cluster_members(self, cluster_ids: Iterable[int]) -> List[int]:
+        """Duplicates that joined the given clusters"""
+        cluster_ids = list(cluster_ids)
+        if not cluster_ids:
+            return []
+
+        conn = news_db.connect(self.db_name)
+        placeholders = ','.join('?' * len(cluster_ids))
+        rows = conn.execute(f"""
+            SELECT article_id FROM article_fingerprints
+            WHERE cluster_id IN ({placeholders}) AND article_id != cluster_id
+        """, cluster_ids).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def share_cluster_images(self, article_ids: Iterable[int]):
+        """Give duplicates the stored image of their cluster head, once it has one"""
+        article_ids = list(article_ids)
+        if not article_ids:
+            return
+
+        conn = news_db.connect(self.db_name)
+        placeholders = ','.join('?' * len(article_ids))
+        conn.execute(f"""
+            INSERT OR REPLACE INTO article_images (article_id, content_hash)
+            SELECT f.article_id, ai.content_hash FROM article_fingerprints f
+            JOIN article_images ai ON ai.article_id = f.cluster_id
+            WHERE f.article_id IN ({placeholders})
+        """, article_ids)
+        conn.execute(f"""
+            UPDATE articles SET local_image_path = (
+                SELECT head.local_image_path FROM article_fingerprints f
+                JOIN articles head ON head.id = f.cluster_id
+                WHERE f.article_id = articles.id
+            )
+            WHERE id IN ({placeholders}) AND id IN (
+                SELECT f.article_id FROM article_fingerprints f
+                JOIN article_images ai ON ai.article_id = f.cluster_id
+            )
+        """, article_ids)
+        conn.commit()
+        conn.close()
@@ -0,0 +1,326 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterator, Optional
+
+# Applied to every connection; journal_mode is persistent and set once in enable_wal
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",  # safe with WAL, avoids an fsync per commit
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",  # ~16MB page cache
+    "PRAGMA mmap_size = 134217728",  # 128MB memory-mapped reads
+]
+
+
+def connect(db_name: str, timeout: float = 30.0, **options) -> sqlite3.Connection:
+    """Open a SQLite connection with the tuned pragmas applied (options go to sqlite3.connect)"""
+    conn = sqlite3.connect(db_name, timeout=timeout, **options)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """Long-lived connections for request handlers, instead of a connect/close per query
+
+    Connections are opened on demand with the pragmas applied once, lent to one
+    thread at a time and kept (up to `max_idle`) for the next request, so
+    sqlite3's per-connection prepared-statement cache carries over between
+    requests. connection() is re-entrant: nested calls on the same thread share
+    one connection, so a page render wrapped in it uses a single connection for
+    all its queries. After a fork (gunicorn workers) the child starts with an
+    empty pool rather than sharing the parent's connections.
+    """
+
+    def __init__(self, db_name: str, max_idle: int = 8, timeout: float = 30.0, cached_statements: int = 256):
+        self.db_name = db_name
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.opened = 0
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def _acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._idle, self._pid = [], os.getpid()
+            if self._idle:
+                return self._idle.pop()
+            self.opened += 1
+        return connect(self.db_name, self.timeout, check_same_thread=False,
+                       cached_statements=self.cached_statements)
+
+    def _release(self, conn: sqlite3.Connection):
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow this thread's connection; commits on success, rolls back on error"""
+        held = getattr(self._local, 'held', None)
+        if held:
+            held[1] += 1
+            try:
+                yield held[0]
+            finally:
+                held[1] -= 1
+            return
+
+        conn = self._acquire()
+        self._local.held = [conn, 1]
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.held = None
+            self._release(conn)
+
+    def close(self):
+        """Close the idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def enable_wal(db_name: str) -> str:
+    """Switch the database to write-ahead logging so readers never block the writer"""
+    conn = sqlite3.connect(db_name)
+    mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    conn.close()
+    return mode
+
+
+def add_missing_columns(cursor, table: str, columns: dict):
+    """ALTER TABLE ADD COLUMN for every column the existing table does not have yet"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+# Hot article queries shared by the apps and migrations.HOT_QUERIES, so the
+# index check runs the same SQL the apps do. Templates take str.format fields.
+UNIQUE_ARTICLES_JOIN = "LEFT JOIN article_fingerprints f ON f.article_id = a.id"
+UNIQUE_ARTICLES_WHERE = "(f.cluster_id IS NULL OR f.cluster_id = a.id)"  # first-seen article of each cluster
+NEWEST_ARTICLES_SQL = """
+    SELECT {columns}
+    FROM articles a {join}
+    WHERE {where}
+    ORDER BY a.created_epoch DESC
+    LIMIT ?
+"""
+NEWEST_PUBLISHED_SQL = ("SELECT title, description, source, category, published_date FROM articles "
+                        "ORDER BY published_epoch DESC LIMIT 10")
+KNOWN_URLS_SQL = "SELECT url FROM articles WHERE url IN ({placeholders})"
+INSERTED_SINCE_SQL = "SELECT id, image_url, title FROM articles WHERE id > ? ORDER BY id"
+MISSING_EPOCHS_SQL = "SELECT id, published_date, created_epoch FROM articles WHERE published_epoch IS NULL"
+
+
+def to_epoch(value) -> Optional[int]:
+    """Parse an RFC-822 or ISO 8601 timestamp string to Unix seconds (naive times are UTC, as in SQLite)"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        parsed = None
+    if parsed is None:
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def migrate_article_timestamps(cursor, chunk_size: int = 2000) -> int:
+    """Give articles indexed integer published_epoch/created_epoch columns and backfill them
+
+    A trigger fills both for rows inserted without them (the other apps' sample
+    data); RFC-822 dates it cannot parse are picked up by backfill_article_epochs,
+    which migrations.migrate runs on every start. Returns the number of rows
+    backfilled.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles'")
+    if not cursor.fetchone():
+        return 0
+
+    add_missing_columns(cursor, 'articles', {
+        'published_epoch': 'INTEGER',
+        'created_epoch': 'INTEGER',
+    })
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_published_epoch ON articles (published_epoch)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_created_epoch ON articles (created_epoch)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS articles_fill_epochs AFTER INSERT ON articles
+        WHEN NEW.created_epoch IS NULL OR NEW.published_epoch IS NULL
+        BEGIN
+            UPDATE articles SET
+                created_epoch = COALESCE(NEW.created_epoch,
+                                         CAST(strftime('%s', COALESCE(NEW.created_at, 'now')) AS INTEGER)),
+                published_epoch = COALESCE(NEW.published_epoch, CAST(strftime('%s', NEW.published_date) AS INTEGER))
+            WHERE id = NEW.id;
+        END
+    """)
+
+    return backfill_article_epochs(cursor, chunk_size)
+
+
+def backfill_article_epochs(cursor, chunk_size: int = 2000) -> int:
+    """Fill published_epoch/created_epoch where they are still NULL; returns the number of rows backfilled"""
+    cursor.execute("""
+        UPDATE articles SET created_epoch = CAST(strftime('%s', COALESCE(created_at, 'now')) AS INTEGER)
+        WHERE created_epoch IS NULL
+    """)
+    cursor.execute(MISSING_EPOCHS_SQL)
+    # Unparseable publish dates fall back to the ingest time so every row sorts
+    rows = [(to_epoch(published) or created, article_id) for article_id, published, created in cursor.fetchall()]
+    for i in range(0, len(rows), chunk_size):
+        cursor.executemany("UPDATE articles SET published_epoch = ? WHERE id = ?", rows[i:i + chunk_size])
+    return len(rows)
+
+
+def _count_up(table: str, column: str, row: str, when: str = '1') -> str:
+    """Trigger statement adding one to the counter for row.column"""
+    return f"""
+            INSERT INTO {table} ({column}, articles) SELECT {row}.{column}, 1
+            WHERE {row}.{column} IS NOT NULL AND {when}
+            ON CONFLICT({column}) DO UPDATE SET articles = articles + 1;"""
+
+
+def _count_down(table: str, column: str, row: str, when: str = '1') -> str:
+    """Trigger statements taking one off the counter for row.column, dropping it at zero"""
+    return f"""
+            UPDATE {table} SET articles = articles - 1 WHERE {column} = {row}.{column} AND {when};
+            DELETE FROM {table} WHERE {column} = {row}.{column} AND articles <= 0 AND {when};"""
+
+
+def migrate_article_stats(cursor) -> bool:
+    """Trigger-maintained article counters, so the stats bar is a single-row read
+
+    article_stats holds the totals (one row), article_source_counts and
+    article_category_counts the per-source/per-category counts; triggers on
+    articles keep all three up to date on insert, update and delete. Returns
+    True if the counters were (re)built from the articles table.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles'")
+    if not cursor.fetchone():
+        return False
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS article_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_articles INTEGER NOT NULL DEFAULT 0,
+            posted_to_social INTEGER NOT NULL DEFAULT 0,
+            sources_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table, column in (('article_source_counts', 'source'), ('article_category_counts', 'category')):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {column} TEXT PRIMARY KEY NOT NULL,
+                articles INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+    # A source appearing or disappearing changes sources_count
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS article_source_counts_added AFTER INSERT ON article_source_counts
+        BEGIN
+            UPDATE article_stats SET sources_count = sources_count + 1 WHERE id = 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS article_source_counts_removed AFTER DELETE ON article_source_counts
+        BEGIN
+            UPDATE article_stats SET sources_count = sources_count - 1 WHERE id = 1;
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS articles_stats_insert AFTER INSERT ON articles
+        BEGIN
+            UPDATE article_stats SET total_articles = total_articles + 1,
+                posted_to_social = posted_to_social + COALESCE(NEW.posted_to_social = TRUE, 0)
+            WHERE id = 1;
+            {_count_up('article_source_counts', 'source', 'NEW')}
+            {_count_up('article_category_counts', 'category', 'NEW')}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS articles_stats_delete AFTER DELETE ON articles
+        BEGIN
+            UPDATE article_stats SET total_articles = total_articles - 1,
+                posted_to_social = posted_to_social - COALESCE(OLD.posted_to_social = TRUE, 0)
+            WHERE id = 1;
+            {_count_down('article_source_counts', 'source', 'OLD')}
+            {_count_down('article_category_counts', 'category', 'OLD')}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS articles_stats_update AFTER UPDATE OF posted_to_social, source, category
+        ON articles
+        BEGIN
+            UPDATE article_stats SET posted_to_social = posted_to_social
+                + COALESCE(NEW.posted_to_social = TRUE, 0) - COALESCE(OLD.posted_to_social = TRUE, 0)
+            WHERE id = 1;
+            {_count_down('article_source_counts', 'source', 'OLD', 'OLD.source IS NOT NEW.source')}
+            {_count_up('article_source_counts', 'source', 'NEW', 'OLD.source IS NOT NEW.source')}
+            {_count_down('article_category_counts', 'category', 'OLD', 'OLD.category IS NOT NEW.category')}
+            {_count_up('article_category_counts', 'category', 'NEW', 'OLD.category IS NOT NEW.category')}
+        END
+    """)
+
+    cursor.execute("SELECT 1 FROM article_stats WHERE id = 1")
+    if cursor.fetchone():
+        return False
+    recount_article_stats(cursor)
+    return True
+
+
+def recount_article_stats(cursor):
+    """Rebuild the counters from a full scan (first migration, or to repair them)"""
+    # The deletes and inserts below fire the sources_count triggers; the final
+    # row overwrites whatever they did
+    for table, column in (('article_source_counts', 'source'), ('article_category_counts', 'category')):
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"""
+            INSERT INTO {table} ({column}, articles)
+            SELECT {column}, COUNT(*) FROM articles WHERE {column} IS NOT NULL GROUP BY {column}
+        """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO article_stats (id, total_articles, posted_to_social, sources_count)
+        SELECT 1, COUNT(*), COALESCE(SUM(posted_to_social = TRUE), 0),
+               (SELECT COUNT(*) FROM article_source_counts)
+        FROM articles
+    """)
+
+
+def read_article_stats(cursor, breakdown: bool = False) -> dict:
+    """The stats bar numbers from article_stats; with breakdown, the per-source and per-category counts too"""
+    cursor.execute("SELECT total_articles, posted_to_social, sources_count FROM article_stats WHERE id = 1")
+    total, posted, sources = cursor.fetchone() or (0, 0, 0)
+    stats = {'total_articles': total, 'posted_to_social': posted, 'sources_count': sources}
+    if breakdown:
+        cursor.execute("SELECT source, articles FROM article_source_counts ORDER BY articles DESC, source")
+        stats['sources'] = dict(cursor.fetchall())
+        cursor.execute("SELECT category, articles FROM article_category_counts ORDER BY articles DESC, category")
+        stats['categories'] = dict(cursor.fetchall())
+    return stats
@@ -1,45 +1,101 @@
 import requests
 import json
 from datetime import datetime
-import sqlite3
 import feedparser
-from typing import List, Dict
+import fast_feed_parser
+from typing import Dict, Iterator, List
 import time
+import calendar
 import os
-import urllib.request
+import sys
 from urllib.parse import urlparse
-import hashlib
 from PIL import Image
 import io
+from feed_fetcher import ConcurrentFeedFetcher
+from feed_scheduler import FeedScheduler
+from http_client import DeadlineExceeded, HttpClient
+from image_pipeline import ImagePipeline
+from image_store import ImageStore, content_hash
+import image_transform
+from image_transform import ImageTransformPool
+from host_health import HostCircuitBreaker, NegativeCache, is_host_failure, is_permanent_failure, is_timeout
+from job_queue import JobQueue, JobRunner
+from metrics import MetricsRecorder
+from near_duplicates import NearDuplicateIndex
+import migrations
+import news_db
+
+# Magic numbers of the formats we accept: JPEG, PNG, GIF, WebP (RIFF), BMP
+IMAGE_SIGNATURES = (b'\xff\xd8', b'\x89PNG', b'GIF8', b'RIFF', b'BM')
 
 
 class NigerianNewsBlogWithImages:
     def __init__(self):
         self.db_name = 'nigerian_news_blog.db'
         self.images_folder = 'static/images'
+        self.fetch_workers = 8
+        self.max_requests_per_host = 1
+        # 0 transforms images in the download threads; a single CPU gains nothing from a worker process
+        cpus = os.cpu_count() or 1
+        self.image_process_workers = cpus if cpus > 1 else 0
+        self.image_concurrency = max(4, self.image_process_workers)
+        self.db_write_chunk_size = 2000
+        self.max_image_bytes = 5 * 1024 * 1024
+        self.max_image_width = 800
+        self.thumbnail_widths = (320, 480)
+        self.job_workers = 4
+        self.feed_buffer_size = 4  # fetched feeds waiting to be stored
+        self.image_queue_size = 200  # image jobs waiting for a download worker
+        self.feed_timeout = 30  # seconds per feed, connect to last byte
+        self.cycle_budget = 240  # seconds per cycle; stays under the web app's 300s ingestion timeout
+        self.use_fast_parser = False  # opt-in streaming parser for well-formed RSS/Atom
+        self.rss_feeds = [
+            # Nigerian News Sources
+            ("https://vanguardngr.com/feed/", "nigeria"),
+            ("https://guardian.ng/feed/", "nigeria"),
+            ("https://punchng.com/feed/", "nigeria"),
+            ("https://dailypost.ng/feed/", "nigeria"),
+            ("https://premiumtimesng.com/feed/", "nigeria"),
+            ("https://saharareporters.com/rss", "nigeria"),
+
+            # Nigerian Sports News
+            ("https://www.completesports.com/feed/", "sports"),
+            ("https://soccernet.ng/feed/", "sports"),
+            ("https://brila.net/feed/", "sports"),
+
+            # Nigerian Entertainment News
+            ("https://lindaikejisblog.com/feed/", "entertainment"),
+            ("https://bellanaija.com/feed/", "entertainment"),
+            ("https://pulse.ng/entertainment/feed", "entertainment"),
+            ("https://www.naijaloaded.com.ng/feed/", "entertainment"),
+            ("https://tooexclusive.com/feed/", "entertainment"),
+        ]
+        self.image_store = ImageStore(self.db_name)
+        self.image_transformer = ImageTransformPool(self.image_process_workers)
+        self.http = HttpClient()
+        self.pending_watermarks = {}
+        self.pending_validators = {}
+        self.feed_outcomes = {}
+        self.cycle_deadline = None
+        self.pending_duplicates = set()
+        self.scheduler = FeedScheduler(self.db_name)
+        self.job_queue = JobQueue(self.db_name)
+        self.near_duplicates = NearDuplicateIndex(self.db_name)
+        self.metrics = MetricsRecorder(self.db_name)
+        self.circuit_breaker = HostCircuitBreaker(self.db_name)
+        self.negative_cache = NegativeCache(self.db_name)
         self.setup_database()
         self.setup_images_folder()
+        self.image_pipeline = ImagePipeline(self.download_and_process_image, self.image_store.link_articles,
+                                            concurrency=self.image_concurrency, max_queue=self.image_queue_size)
 
     def setup_database(self):
         """Setup SQLite database with image support"""
-        conn = sqlite3.connect(self.db_name)
+        news_db.enable_wal(self.db_name)
+        conn = news_db.connect(self.db_name)
         cursor = conn.cursor()
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS articles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                url TEXT UNIQUE,
-                published_date DATETIME,
-                source TEXT,
-                category TEXT,
-                image_url TEXT,
-                local_image_path TEXT,
-                posted_to_social BOOLEAN DEFAULT FALSE,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        migrations.migrate(cursor)
 
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS social_posts (
@@ -54,6 +110,28 @@ class NigerianNewsBlogWithImages:
             )
         """)
 
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS feed_state (
+                feed_url TEXT PRIMARY KEY,
+                etag TEXT,
+                modified TEXT,
+                last_status INTEGER,
+                last_seen DATETIME
+            )
+        """)
+        news_db.add_missing_columns(cursor, 'feed_state', {
+            'last_entry_id': 'TEXT',
+            'last_published': 'INTEGER',
+        })
+
+        self.image_store.setup(cursor)
+        self.scheduler.setup(cursor)
+        self.job_queue.setup(cursor)
+        self.near_duplicates.setup(cursor)
+        self.metrics.setup(cursor)
+        self.circuit_breaker.setup(cursor)
+        self.negative_cache.setup(cursor)
+
         conn.commit()
         conn.close()
         print("✅ Database with image support initialized!")
@@ -99,58 +177,117 @@ class NigerianNewsBlogWithImages:
 
         return image_url
 
-    def download_and_process_image(self, image_url: str, article_title: str) -> str:
-        """Download image and create thumbnail"""
+    def download_and_process_image(self, image_url: str, article_title: str, build_variants: bool = True) -> str:
+        """Download image into the content-addressed store and return its path"""
         if not image_url:
             return None
 
         try:
-            # Create filename from article title and image URL
-            title_hash = hashlib.md5(article_title.encode()).hexdigest()[:8]
-            url_hash = hashlib.md5(image_url.encode()).hexdigest()[:8]
-            filename = f"{title_hash}_{url_hash}.jpg"
-
-            full_path = os.path.join(self.images_folder, filename)
-
-            # Skip if already downloaded
-            if os.path.exists(full_path):
-                return f"images/{filename}"
-
-            # Download image with headers to avoid blocking
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-
-            req = urllib.request.Request(image_url, headers=headers)
-            with urllib.request.urlopen(req, timeout=10) as response:
-                image_data = response.read()
-
-            # Process image with PIL
-            image = Image.open(io.BytesIO(image_data))
-
-            # Convert to RGB if necessary
-            if image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-
-            # Save optimized image (max 800px width)
-            if image.width > 800:
-                ratio = 800 / image.width
-                new_size = (800, int(image.height * ratio))
-                image = image.resize(new_size, Image.Resampling.LANCZOS)
-
-            image.save(full_path, 'JPEG', quality=85, optimize=True)
-
-            print(f"✅ Downloaded image: {filename}")
-            return f"images/{filename}"
+            with self.image_store.url_lock(image_url):
+                # Skip if this URL was already downloaded
+                local_path = self.image_store.path_for_url(image_url)
+                if local_path:
+                    self.metrics.record('image.cache_hits', 1)
+                    return local_path
+
+                # Known-bad URL or a host that keeps failing: skip without waiting on a timeout
+                if self.negative_cache.is_blocked(image_url):
+                    self.metrics.record('image.negative_cache_hits', 1)
+                    return None
+                if not self.circuit_breaker.allow(image_url):
+                    self.metrics.record('image.circuit_open', 1)
+                    return None
+
+                with self.metrics.timer('image.download_seconds'):
+                    image_data = self.fetch_image_bytes(image_url)
+                self.circuit_breaker.record_success(image_url)
+                self.metrics.record('image.bytes', len(image_data))
+
+                # Same picture already stored from another outlet
+                digest = content_hash(image_data)
+                with self.image_store.content_lock(digest):
+                    local_path = self.image_store.path_for_content(digest)
+                    if local_path:
+                        self.image_store.add(image_url, digest)
+                        self.metrics.record('image.cache_hits', 1)
+                        return local_path
+
+                    # Decode, resize and encode on the process pool; only bytes cross over
+                    with self.metrics.timer('image.process_seconds'):
+                        result = self.image_transformer.run(image_transform.transform, image_data,
+                                                            self.max_image_width, self.thumbnail_widths,
+                                                            build_variants)
+
+                    filename = f"{digest[:32]}.jpg"
+                    with open(os.path.join(self.images_folder, filename), 'wb') as f:
+                        f.write(result['jpeg'])
+
+                    local_path = f"images/{filename}"
+                    self.image_store.add(image_url, digest, local_path,
+                                         result['width'], result['height'], len(result['jpeg']))
+                    if build_variants:
+                        self.image_store.add_variants(digest, self.save_image_variants(
+                            result['variants'], digest, local_path, result['width'], len(result['jpeg'])))
+                print(f"✅ Downloaded image: {filename}")
+                return local_path
 
         except Exception as e:
+            self.metrics.record('image.errors', 1)
+            self.remember_image_failure(image_url, e)
             print(f"❌ Error downloading image {image_url}: {str(e)}")
             return None
 
+    def remember_image_failure(self, image_url: str, error: Exception):
+        """Count host failures against the circuit breaker and negative-cache the URL"""
+        if is_host_failure(error):
+            self.circuit_breaker.record_failure(image_url, error)
+            self.negative_cache.add(image_url, error)
+        else:
+            self.negative_cache.add(image_url, error, permanent=is_permanent_failure(error))
+
+    def fetch_image_bytes(self, image_url: str) -> bytes:
+        """Stream an image download, rejecting non-images and anything over max_image_bytes"""
+        with self.http.get(image_url, stream=True) as response:
+            response.raise_for_status()
+
+            # Check the headers before reading any of the body. Only text (an HTML error
+            # page) is refused here: S3 serves images as binary/octet-stream, and the
+            # magic-number check below catches anything else that is not an image
+            content_type = response.headers.get('Content-Type', '')
+            if content_type.lower().startswith('text/'):
+                raise ValueError(f"not an image ({content_type})")
+
+            content_length = response.headers.get('Content-Length')
+            if content_length and int(content_length) > self.max_image_bytes:
+                raise ValueError(f"image too large ({int(content_length)} bytes)")
+
+            chunks = []
+            received = 0
+            for chunk in response.iter_content(64 * 1024):
+                if not chunks and not chunk.startswith(IMAGE_SIGNATURES):
+                    raise ValueError("unrecognised image data")
+                received += len(chunk)
+                if received > self.max_image_bytes:
+                    raise ValueError(f"image exceeds {self.max_image_bytes} bytes")
+                chunks.append(chunk)
+
+        return b''.join(chunks)
+
+    def process_image(self, image_data: bytes) -> Image.Image:
+        """Decode image bytes, flatten transparency and cap the width at 800px (in this process)"""
+        return image_transform.prepare_image(image_data, self.max_image_width)
+
+    def save_image_variants(self, rendered: List[tuple], digest: str, local_path: str,
+                            width: int, size_bytes: int) -> List[tuple]:
+        """Write encoded srcset variants next to the main image; returns (width, format, path, bytes)"""
+        variants = [(width, 'jpeg', local_path, size_bytes)]
+        for variant_width, fmt, ext, data in rendered:
+            filename = f"{digest[:32]}_{variant_width}.{ext}"
+            with open(os.path.join(self.images_folder, 'thumbnails', filename), 'wb') as f:
+                f.write(data)
+            variants.append((variant_width, fmt, f"images/thumbnails/{filename}", len(data)))
+        return variants
+
     def create_fallback_images(self):
         """Create simple fallback images if they don't exist"""
         fallbacks_dir = os.path.join(self.images_folder, 'fallbacks')
@@ -193,83 +330,432 @@ class NigerianNewsBlogWithImages:
         except ImportError:
             print("⚠️  PIL not available for creating fallback images")
 
+    def get_feed_state(self, rss_url: str) -> Dict:
+        """Get the stored conditional GET validators for a feed"""
+        conn = news_db.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT etag, modified, last_entry_id, last_published FROM feed_state WHERE feed_url = ?
+        """, (rss_url,))
+        row = cursor.fetchone()
+        conn.close()
+        if not row:
+            return {'etag': None, 'modified': None, 'last_entry_id': None, 'last_published': None}
+        return {'etag': row[0], 'modified': row[1], 'last_entry_id': row[2], 'last_published': row[3]}
+
+    def save_feed_state(self, rss_url: str, etag: str, modified: str, status: int):
+        """Remember the validators and status of the last fetch of a feed"""
+        conn = news_db.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO feed_state (feed_url, etag, modified, last_status, last_seen)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(feed_url) DO UPDATE SET
+                etag = excluded.etag, modified = excluded.modified,
+                last_status = excluded.last_status, last_seen = excluded.last_seen
+        """, (rss_url, etag, modified, status))
+        conn.commit()
+        conn.close()
+
+    def save_feed_validators_for(self, rss_url: str):
+        """Persist the validators of a feed's last 200 response, once its articles are stored"""
+        validators = self.pending_validators.pop(rss_url, None)
+        if validators:
+            self.save_feed_state(rss_url, *validators)
+
+    def clear_feed_validators(self, rss_urls: List[str]):
+        """Forget the validators of feeds whose entries were not all stored, so the next fetch is not a 304"""
+        for rss_url in rss_urls:
+            self.pending_validators.pop(rss_url, None)
+        conn = news_db.connect(self.db_name)
+        conn.executemany("UPDATE feed_state SET etag = NULL, modified = NULL WHERE feed_url = ?",
+                         [(rss_url,) for rss_url in rss_urls])
+        conn.commit()
+        conn.close()
+
+    def save_feed_watermarks_for(self, rss_url: str):
+        """Persist the pending watermark of a single feed"""
+        watermark = self.pending_watermarks.pop(rss_url, None)
+        if watermark:
+            self.save_feed_watermarks({rss_url: watermark})
+
+    def save_feed_watermarks(self, watermarks: Dict = None):
+        """Persist the newest entry seen per feed, once its articles are stored"""
+        if watermarks is None:
+            watermarks, self.pending_watermarks = self.pending_watermarks, {}
+        if not watermarks:
+            return
+
+        conn = news_db.connect(self.db_name)
+        conn.executemany("""
+            UPDATE feed_state SET last_entry_id = ?, last_published = ? WHERE feed_url = ?
+        """, [(entry_id, published, rss_url) for rss_url, (entry_id, published) in watermarks.items()])
+        conn.commit()
+        conn.close()
+
+    def build_articles(self, feed, rss_url: str, category: str, state: Dict) -> List[Dict]:
+        """Turn parsed feed entries into article dicts, stopping at the feed's high-watermark"""
+        articles = []
+        first_id, newest_id, newest_published = None, None, None
+        now = int(time.time())
+        # A watermark time in the future (a feed with the wrong timezone) would hide every new entry
+        since = state['last_published'] if state['last_published'] and state['last_published'] <= now else None
+        watermark_seen, watermark_published = False, None
+
+        for entry in feed.entries:
+            entry_id = entry.get('id') or entry.get('link')
+            published = calendar.timegm(entry.published_parsed) if entry.get('published_parsed') else None
+            if watermark_seen:
+                # The entry after the watermark tells the order: not newer means the feed lists
+                # newest first and everything from here on was ingested before
+                if not (published and watermark_published and published > watermark_published):
+                    break
+                watermark_seen = False  # oldest first: the new entries follow the watermark
+            if entry_id and entry_id == state['last_entry_id']:
+                watermark_seen, watermark_published = True, published
+                continue
+            # Older than the watermark entry: skip it but keep going, since one
+            # mis-dated entry must not cut off the rest of the feed
+            if published and since and published < since:
+                continue
+
+            # The next watermark is the newest new entry (future dates excluded),
+            # or the first one when the feed has no dates
+            if first_id is None:
+                first_id = entry_id
+            if published and published <= now and (newest_published is None or published > newest_published):
+                newest_id, newest_published = entry_id, published
+
+            # Extract image URL
+            image_url = self.extract_image_from_entry(entry)
+
+            article = {
+                'title': entry.get('title', 'No Title'),
+                'description': entry.get('summary', 'No Description'),
+                'url': entry.get('link', ''),
+                'published_date': entry.get('published', str(datetime.now())),
+                'published_epoch': published or int(time.time()),
+                'source': feed.feed.get('title', 'Unknown Source'),
+                'category': category,
+                'image_url': image_url,
+                'feed_url': rss_url
+            }
+            articles.append(article)
+
+        if articles:
+            self.pending_watermarks[rss_url] = (newest_id, newest_published) if newest_id else (first_id, None)
+        return articles
+
+    def feed_deadline(self) -> float:
+        """time.monotonic() by which a feed fetch started now must finish"""
+        deadline = time.monotonic() + self.feed_timeout
+        return min(deadline, self.cycle_deadline) if self.cycle_deadline else deadline
+
     def fetch_news_from_rss(self, rss_url: str, category: str = "nigeria") -> List[Dict]:
         """Fetch news from RSS feed with image extraction"""
+        deadline = self.feed_deadline()
+        if deadline <= time.monotonic():
+            return []  # the cycle already gave up on this feed
+
+        if not self.circuit_breaker.allow(rss_url):
+            self.feed_outcomes[rss_url] = 'error'
+            self.metrics.record('feed.circuit_open', 1, rss_url)
+            print(f"⛔ Circuit open, skipping {rss_url}")
+            return []
+
         try:
-            feed = feedparser.parse(rss_url)
-            articles = []
-
-            for entry in feed.entries:
-                # Extract image URL
-                image_url = self.extract_image_from_entry(entry)
-
-                article = {
-                    'title': entry.get('title', 'No Title'),
-                    'description': entry.get('summary', 'No Description'),
-                    'url': entry.get('link', ''),
-                    'published_date': entry.get('published', str(datetime.now())),
-                    'source': feed.feed.get('title', 'Unknown Source'),
-                    'category': category,
-                    'image_url': image_url
-                }
-                articles.append(article)
+            # Replay validators so unchanged feeds come back as 304 Not Modified
+            state = self.get_feed_state(rss_url)
+            headers = {}
+            if state['etag']:
+                headers['If-None-Match'] = state['etag']
+            if state['modified']:
+                headers['If-Modified-Since'] = state['modified']
+
+            with self.metrics.timer('feed.latency_seconds', rss_url):
+                response = self.http.get_with_deadline(rss_url, headers=headers, deadline=deadline)
+            status = response.status_code
+            if status < 500:
+                self.circuit_breaker.record_success(rss_url)
+
+            if status == 304:
+                self.save_feed_state(rss_url, state['etag'], state['modified'], status)
+                self.feed_outcomes[rss_url] = 'not_modified'
+                self.metrics.record('feed.not_modified', 1, rss_url)
+                print(f"⏭️  Not modified: {rss_url}")
+                return []
+
+            validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'), status)
+            if not response.ok:
+                self.save_feed_state(rss_url, *validators)
+            response.raise_for_status()
+            self.metrics.record('feed.bytes', len(response.content), rss_url)
+
+            parse_start = time.perf_counter()
+            articles = None
+            if self.use_fast_parser:
+                try:
+                    articles = self.build_articles(fast_feed_parser.parse(response.content),
+                                                   rss_url, category, state)
+                except fast_feed_parser.FeedFormatError as e:
+                    print(f"⚠️  Streaming parser gave up on {rss_url} ({e}), using feedparser")
+
+            if articles is None:
+                feed = feedparser.parse(response.content,
+                                        response_headers={k.lower(): v for k, v in response.headers.items()})
+                articles = self.build_articles(feed, rss_url, category, state)
+            if time.monotonic() > deadline:
+                raise DeadlineExceeded(f"{rss_url} finished parsing after its deadline")
+            # Saved with the watermark once the articles are stored; a 304 must never hide unstored entries
+            self.pending_validators[rss_url] = validators
+            self.feed_outcomes[rss_url] = 'ok'
+            self.metrics.record('feed.parse_seconds', time.perf_counter() - parse_start, rss_url)
+            self.metrics.record('feed.entries', len(articles), rss_url)
 
             source_name = rss_url.split('/')[2].replace('www.', '').replace('.com', '').replace('.ng', '').upper()
             print(f"✅ Fetched {len(articles)} articles from {source_name} ({category.upper()})")
             return articles
 
+        except DeadlineExceeded as e:
+            self.pending_watermarks.pop(rss_url, None)
+            self.clear_feed_validators([rss_url])
+            self.feed_outcomes[rss_url] = 'timeout'
+            self.metrics.record('feed.timeouts', 1, rss_url)
+            print(f"⌛ Gave up on {rss_url}: {str(e)}")
+            return []
+
         except Exception as e:
+            if is_host_failure(e):
+                self.circuit_breaker.record_failure(rss_url, e)
+            if is_timeout(e):
+                # A host that never answers runs out of read retries rather than the deadline
+                self.feed_outcomes[rss_url] = 'timeout'
+                self.metrics.record('feed.timeouts', 1, rss_url)
+                print(f"⌛ Gave up on {rss_url}: {str(e)}")
+                return []
+            self.feed_outcomes[rss_url] = 'error'
+            self.metrics.record('feed.errors', 1, rss_url)
             print(f"❌ Error fetching from {rss_url}: {str(e)}")
             return []
 
-    def save_articles(self, articles: List[Dict]) -> List[int]:
-        """Save articles to database with image processing"""
-        conn = sqlite3.connect(self.db_name)
+    def fallback_image_for(self, category: str) -> str:
+        """Get the fallback image path for a category"""
+        fallback_images = {
+            'nigeria': 'images/fallbacks/nigeria_flag.jpg',
+            'sports': 'images/fallbacks/football.jpg',
+            'entertainment': 'images/fallbacks/nollywood.jpg'
+        }
+        return fallback_images.get(category.lower(), 'images/fallbacks/news_default.jpg')
+
+    def find_known_urls(self, urls: List[str], chunk_size: int = 500) -> set:
+        """Look up which article URLs are already stored (uses the UNIQUE url index)"""
+        conn = news_db.connect(self.db_name)
         cursor = conn.cursor()
-        saved_ids = []
+        known = set()
+        urls = list(set(urls))
+
+        for i in range(0, len(urls), chunk_size):
+            chunk = urls[i:i + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(news_db.KNOWN_URLS_SQL.format(placeholders=placeholders), chunk)
+            known.update(row[0] for row in cursor.fetchall())
+
+        conn.close()
+        return known
+
+    def filter_new_articles(self, articles: List[Dict]) -> List[Dict]:
+        """Drop articles that are already in the database before any image work"""
+        known = self.find_known_urls([article['url'] for article in articles])
+        new_articles = [article for article in articles if article['url'] not in known]
 
+        per_feed = {}
+        for article in articles:
+            counts = per_feed.setdefault(article.get('feed_url') or article['source'], [0, 0])
+            counts[article['url'] in known] += 1
+        for feed, (new_count, known_count) in per_feed.items():
+            print(f"🔎 {feed}: {new_count} new / {known_count} known")
+
+        return new_articles
+
+    def save_articles(self, articles: List[Dict], chunk_size: int = None) -> List[int]:
+        """Bulk-insert articles and queue their images on the image pipeline
+
+        Storing never waits for image capacity: when the pipeline's queue is
+        full the article keeps its fallback image and the download goes to the
+        durable job queue, which the end of the cycle (run_deferred_image_jobs)
+        or a queued cycle works through.
+        """
+        with self.metrics.timer('save.seconds'):
+            saved_ids, image_jobs = self.insert_articles(articles, chunk_size)
+        self.metrics.record('save.rows', len(saved_ids))
+        image_jobs = self.skip_duplicate_images(saved_ids, image_jobs)
+
+        queued, overflow = 0, []
+        for article_id, image_url, article_title in image_jobs:
+            if self.image_pipeline.submit(article_id, image_url, article_title, block=False):
+                queued += 1
+            else:
+                overflow.append((article_id, image_url, article_title))
+        if overflow:
+            self.defer_image_jobs(overflow)
+
+        print(f"✅ Saved {len(saved_ids)} new articles, {queued} images queued"
+              + (f", {len(overflow)} deferred to the job queue" if overflow else ""))
+        return saved_ids
+
+    def defer_image_jobs(self, image_jobs: List[tuple]):
+        """Hand image downloads the pipeline had no room for to the durable job queue"""
+        conn = news_db.connect(self.db_name)
+        cursor = conn.cursor()
+        for article_id, image_url, article_title in image_jobs:
+            self.job_queue.enqueue('image_download',
+                                   {'article_id': article_id, 'image_url': image_url, 'title': article_title},
+                                   dedupe_key=f"image:{article_id}", cursor=cursor)
+        conn.commit()
+        conn.close()
+        self.metrics.record('save.images_deferred', len(image_jobs))
+
+    def run_deferred_image_jobs(self):
+        """Work through queued image_download (and thumbnail_build) jobs until none are due or the budget ends"""
+        handlers = {'image_download': self.handle_image_download_job,
+                    'thumbnail_build': self.handle_thumbnail_build_job}
+        if self.time_left() == 0 or not self.job_queue.has_runnable(list(handlers)):
+            return
+
+        print("📥 Downloading deferred images...")
+        runner = JobRunner(self.job_queue, handlers, workers=self.job_workers, poll_interval=0.2)
+        with self.metrics.timer('cycle.deferred_images_seconds'):
+            runner.run(drain=True, deadline=self.cycle_deadline)
+        self.metrics.record('cycle.deferred_jobs_done', runner.completed)
+        print(f"✅ Deferred image jobs: {runner.completed} done")
+
+    def skip_duplicate_images(self, saved_ids: List[int], image_jobs: List[tuple]) -> List[tuple]:
+        """Cluster new articles by MinHash and drop image work for near-duplicate stories"""
+        duplicates = self.near_duplicates.index_articles(saved_ids)
+        sharing = self.near_duplicates.with_cluster_image(duplicates)
+        self.pending_duplicates |= sharing
+        if duplicates:
+            print(f"🧬 {len(duplicates)} near-duplicate stories, {len(sharing)} reuse their cluster's image")
+        return [job for job in image_jobs if job[0] not in sharing]
+
+    def insert_articles(self, articles: List[Dict], chunk_size: int = None, on_chunk=None) -> tuple:
+        """Bulk-insert articles in chunked transactions
+
+        Returns the new ids and (article_id, image_url, title) for those that have an image.
+        `on_chunk(cursor, image_jobs)` runs inside each chunk's transaction, before its commit.
+        """
+        chunk_size = chunk_size or self.db_write_chunk_size
+        now = int(time.time())
+        rows = []
         for article in articles:
             try:
-                # Download and process image
-                local_image_path = None
-                if article.get('image_url'):
-                    local_image_path = self.download_and_process_image(
-                        article['image_url'],
-                        article['title']
-                    )
-
-                # If no image downloaded, use fallback
-                if not local_image_path:
-                    fallback_images = {
-                        'nigeria': 'images/fallbacks/nigeria_flag.jpg',
-                        'sports': 'images/fallbacks/football.jpg',
-                        'entertainment': 'images/fallbacks/nollywood.jpg'
-                    }
-                    local_image_path = fallback_images.get(article['category'].lower(),
-                                                           'images/fallbacks/news_default.jpg')
-
-                cursor.execute("""
-                    INSERT OR IGNORE INTO articles 
-                    (title, description, url, published_date, source, category, image_url, local_image_path)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+                # Insert with the fallback image; the image pipeline swaps in the real one
+                rows.append((
                     article['title'], article['description'], article['url'],
                     article['published_date'], article['source'], article['category'],
-                    article.get('image_url'), local_image_path
+                    article.get('image_url'), self.fallback_image_for(article['category']),
+                    article.get('published_epoch') or news_db.to_epoch(article['published_date']) or now,
+                    now
                 ))
-
-                if cursor.rowcount > 0:
-                    saved_ids.append(cursor.lastrowid)
-
             except Exception as e:
                 print(f"Error saving article: {e}")
 
-        conn.commit()
+        conn = news_db.connect(self.db_name)
+        cursor = conn.cursor()
+        saved_ids = []
+        image_jobs = []
+
+        for i in range(0, len(rows), chunk_size):
+            # The write lock is held for the whole chunk, so every id above the
+            # current maximum was inserted by this chunk
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM articles")
+            last_id = cursor.fetchone()[0]
+
+            cursor.executemany("""
+                INSERT OR IGNORE INTO articles 
+                (title, description, url, published_date, source, category, image_url, local_image_path,
+                 published_epoch, created_epoch)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows[i:i + chunk_size])
+
+            cursor.execute(news_db.INSERTED_SINCE_SQL, (last_id,))
+            chunk_image_jobs = []
+            for article_id, image_url, title in cursor.fetchall():
+                saved_ids.append(article_id)
+                if image_url:
+                    chunk_image_jobs.append((article_id, image_url, title))
+            if on_chunk:
+                on_chunk(cursor, chunk_image_jobs)
+            image_jobs.extend(chunk_image_jobs)
+            conn.commit()
+
         conn.close()
-        print(f"✅ Saved {len(saved_ids)} new articles with images")
-        return saved_ids
+        return saved_ids, image_jobs
+
+    def time_left(self) -> float:
+        """Seconds until the cycle deadline, None outside a budgeted cycle"""
+        return max(0, self.cycle_deadline - time.monotonic()) if self.cycle_deadline else None
+
+    def feed_fetcher(self) -> ConcurrentFeedFetcher:
+        return ConcurrentFeedFetcher(self.fetch_news_from_rss,
+                                     max_workers=self.fetch_workers,
+                                     max_per_host=self.max_requests_per_host)
+
+    def stream_feeds(self, rss_feeds: List[tuple], concurrent: bool = True) -> Iterator[tuple]:
+        """Fetch and parse feeds, yielding (url, category, articles) as soon as each one is done"""
+        if concurrent:
+            fetcher = self.feed_fetcher()
+            yield from fetcher.stream(rss_feeds, deadline=self.cycle_deadline, buffer_size=self.feed_buffer_size)
+            self.mark_unfinished(fetcher.unfinished)
+            return
+
+        for index, (rss_url, category) in enumerate(rss_feeds):
+            if self.cycle_deadline and time.monotonic() >= self.cycle_deadline:
+                self.mark_unfinished({url: 'cancelled' for url, _ in rss_feeds[index:]})
+                return
+            yield rss_url, category, self.fetch_news_from_rss(rss_url, category)
+            time.sleep(0.5)  # Be nice to servers
 
-    def run_nigerian_news_cycle(self):
+    def ingest_feeds(self, feeds: Iterator[tuple]) -> Iterator[tuple]:
+        """Dedupe and store each feed's articles as it arrives; yields (url, outcome, fetched, saved_ids)"""
+        for rss_url, category, articles in feeds:
+            new_articles = self.filter_new_articles(articles)
+            saved_ids = self.save_articles(new_articles) if new_articles else []
+            # This feed's articles are stored, so its validators and high-watermark can move
+            # forward (validators first: they create the feed_state row the watermark updates)
+            self.save_feed_validators_for(rss_url)
+            self.save_feed_watermarks_for(rss_url)
+            outcome = self.feed_outcomes.get(rss_url, 'error')
+            self.update_feed_schedule([(rss_url, category)], new_articles)
+            yield rss_url, outcome, len(articles), saved_ids
+
+    def mark_unfinished(self, unfinished: Dict[str, str]):
+        """Record feeds the cycle budget cut off ('cancelled' or 'timeout'); they keep their watermarks"""
+        for rss_url, outcome in unfinished.items():
+            self.feed_outcomes[rss_url] = outcome
+            self.pending_watermarks.pop(rss_url, None)
+            self.metrics.record('feed.cancelled', 1, rss_url)
+            print(f"⌛ Cycle budget spent, {outcome}: {rss_url}")
+        if unfinished:
+            self.clear_feed_validators(list(unfinished))
+
+    def update_feed_schedule(self, rss_feeds: List[tuple], new_articles: List[Dict]):
+        """Feed each fetched feed's outcome and new-entry count back into the scheduler"""
+        new_counts = {}
+        for article in new_articles:
+            new_counts[article.get('feed_url')] = new_counts.get(article.get('feed_url'), 0) + 1
+
+        for rss_url, category in rss_feeds:
+            outcome = self.feed_outcomes.pop(rss_url, 'error')
+            if outcome == 'cancelled':
+                print(f"🗓️  {rss_url}: not fetched this cycle, still due")
+                continue
+            delay = self.scheduler.record(rss_url, outcome, new_counts.get(rss_url, 0))
+            self.metrics.record('feed.new_rows', new_counts.get(rss_url, 0), rss_url)
+            print(f"🗓️  {rss_url}: {outcome}, {new_counts.get(rss_url, 0)} new, next in {delay / 60:.0f} min")
+
+    def run_nigerian_news_cycle(self, concurrent: bool = True, due_only: bool = False):
         """Focused news cycle with image processing"""
         print("🇳🇬 Starting Nigerian News Cycle with Images...")
         print("=" * 60)
@@ -277,50 +763,163 @@ class NigerianNewsBlogWithImages:
         # Create fallback images if needed
         self.create_fallback_images()
 
-        # Nigerian RSS feeds
-        rss_feeds = [
-            # Nigerian News Sources
-            ("https://vanguardngr.com/feed/", "nigeria"),
-            ("https://guardian.ng/feed/", "nigeria"),
-            ("https://punchng.com/feed/", "nigeria"),
-            ("https://dailypost.ng/feed/", "nigeria"),
-            ("https://premiumtimesng.com/feed/", "nigeria"),
-            ("https://saharareporters.com/rss", "nigeria"),
-
-            # Nigerian Sports News
-            ("https://www.completesports.com/feed/", "sports"),
-            ("https://soccernet.ng/feed/", "sports"),
-            ("https://brila.net/feed/", "sports"),
+        # Only poll the feeds the adaptive scheduler says are due
+        rss_feeds = self.scheduler.due_feeds(self.rss_feeds) if due_only else self.rss_feeds
+        if not rss_feeds:
+            print("💤 No feeds due yet")
+            return
+
+        self.metrics.start_cycle()
+        cycle_start = time.perf_counter()
+        self.cycle_deadline = time.monotonic() + self.cycle_budget if self.cycle_budget else None
+        self.feed_outcomes, self.pending_watermarks, self.pending_duplicates = {}, {}, set()
+        self.pending_validators = {}
+        images_before = self.image_pipeline.stats()
+        print("📡 Fetching news with images from Nigerian sources...")
 
-            # Nigerian Entertainment News
-            ("https://lindaikejisblog.com/feed/", "entertainment"),
-            ("https://bellanaija.com/feed/", "entertainment"),
-            ("https://pulse.ng/entertainment/feed", "entertainment"),
-            ("https://www.naijaloaded.com.ng/feed/", "entertainment"),
-            ("https://tooexclusive.com/feed/", "entertainment"),
-        ]
+        # fetch -> parse -> dedupe -> store -> image queue, one feed at a time as each arrives
+        start = time.perf_counter()
+        fetched_count, new_count, timed_out = 0, 0, 0
+        for rss_url, outcome, fetched, saved_ids in self.ingest_feeds(self.stream_feeds(rss_feeds, concurrent)):
+            if saved_ids and not new_count:
+                self.metrics.record('cycle.first_commit_seconds', time.perf_counter() - start)
+            fetched_count += fetched
+            new_count += len(saved_ids)
+            timed_out += outcome == 'timeout'
+        mode = "concurrent" if concurrent else "serial"
+        fetch_seconds = time.perf_counter() - start
+        print(f"⏱️  Fetched {len(rss_feeds)} feeds in {fetch_seconds:.2f}s ({mode}), "
+              f"{new_count} new of {fetched_count} fetched articles stored")
+
+        # Feeds the cycle budget cut off never reached the store stage
+        unfinished = [(url, category) for url, category in rss_feeds
+                      if self.feed_outcomes.get(url) in ('timeout', 'cancelled')]
+        timed_out += len(unfinished)
+        self.update_feed_schedule(unfinished, [])
+
+        if new_count:
+            print(f"📸 Processing images ({self.image_pipeline.queue_depth} queued)...")
+            with self.metrics.timer('cycle.images_seconds'):
+                if not self.image_pipeline.wait(timeout=self.time_left()):
+                    # Out of budget: articles keep their fallback images and the downloads
+                    # not started yet go to the job queue for a later cycle
+                    dropped = self.image_pipeline.cancel_pending()
+                    if dropped:
+                        self.defer_image_jobs(dropped)
+            # The pipeline's counters run for the worker's lifetime; report this cycle's share
+            stats = self.image_pipeline.stats()
+            processed, failed, images_cancelled = (stats[key] - images_before[key]
+                                                   for key in ('processed', 'failed', 'cancelled'))
+            if images_cancelled:
+                self.metrics.record('cycle.images_cancelled', images_cancelled)
+                print(f"⌛ Cycle budget spent, {images_cancelled} images deferred to the job queue")
+            self.near_duplicates.share_cluster_images(self.pending_duplicates)
+            print(f"✅ Images: {processed} downloaded, {failed} failed, {images_cancelled} cancelled, "
+                  f"peak queue depth {stats['max_queue_depth']}")
+            print(f"\n✅ Nigerian News Cycle with Images Completed! 🇳🇬📸")
 
-        all_articles = []
+        # Downloads the pipeline had no room for, from this cycle or earlier ones
+        self.run_deferred_image_jobs()
+
+        self.pending_watermarks, self.pending_validators = {}, {}
+        self.cycle_deadline = None
+
+        self.metrics.record('cycle.feeds', len(rss_feeds))
+        self.metrics.record('cycle.timed_out_feeds', timed_out)
+        self.metrics.record('cycle.fetched_articles', fetched_count)
+        self.metrics.record('cycle.new_articles', new_count)
+        self.metrics.record('cycle.fetch_seconds', fetch_seconds)
+        self.metrics.record('cycle.seconds', time.perf_counter() - cycle_start)
+        self.metrics.flush()
+
+    def handle_feed_fetch_job(self, payload: dict):
+        """Job: fetch one feed, store its new articles and queue their images"""
+        rss_url, category = payload['url'], payload['category']
+        articles = self.fetch_news_from_rss(rss_url, category)
+        if self.feed_outcomes.get(rss_url) in ('error', 'timeout'):
+            self.update_feed_schedule([(rss_url, category)], [])
+            raise RuntimeError(f"fetching {rss_url} failed")
+
+        def queue_images(cursor, image_jobs):
+            # Same transaction as the articles, so a crash cannot store them without their image jobs
+            for article_id, image_url, article_title in image_jobs:
+                self.job_queue.enqueue('image_download',
+                                       {'article_id': article_id, 'image_url': image_url, 'title': article_title},
+                                       dedupe_key=f"image:{article_id}", cursor=cursor)
+
+        new_articles = self.filter_new_articles(articles)
+        saved_ids, image_jobs = self.insert_articles(new_articles, on_chunk=queue_images)
+        duplicates = self.near_duplicates.with_cluster_image(self.near_duplicates.index_articles(saved_ids))
+        self.near_duplicates.share_cluster_images(duplicates)
+        self.update_feed_schedule([(rss_url, category)], new_articles)
+        self.save_feed_validators_for(rss_url)
+        if rss_url in self.pending_watermarks:
+            self.save_feed_watermarks_for(rss_url)
+        print(f"✅ Saved {len(saved_ids)} new articles, {len(image_jobs)} image jobs queued")
+
+    def handle_image_download_job(self, payload: dict):
+        """Job: download and store one article image, then queue its thumbnails"""
+        article_id = payload['article_id']
+        if self.near_duplicates.with_cluster_image([article_id]):
+            # a near-duplicate; it shares its cluster head's image instead of downloading its own
+            self.near_duplicates.share_cluster_images([article_id])
+            return
+
+        local_path = self.download_and_process_image(payload['image_url'], payload['title'], build_variants=False)
+        if not local_path:
+            raise RuntimeError(f"image download failed: {payload['image_url']}")
+
+        self.image_store.link_articles([(local_path, payload['article_id'])])
+        self.near_duplicates.share_cluster_images(self.near_duplicates.cluster_members([payload['article_id']]))
+        self.job_queue.enqueue('thumbnail_build', {'local_path': local_path}, dedupe_key=f"thumb:{local_path}")
+
+    def handle_thumbnail_build_job(self, payload: dict):
+        """Job: write the srcset variants of a stored image"""
+        local_path = payload['local_path']
+        digest = self.image_store.content_hash_for_path(local_path)
+        if not digest or self.image_store.has_variants(digest):
+            return
+
+        with open(os.path.join(self.images_folder, os.path.basename(local_path)), 'rb') as f:
+            jpeg_data = f.read()
+        with Image.open(io.BytesIO(jpeg_data)) as image:
+            width = image.width
+        variants = self.image_transformer.run(image_transform.variants_for_stored, jpeg_data, self.thumbnail_widths)
+        self.image_store.add_variants(digest, self.save_image_variants(variants, digest, local_path,
+                                                                       width, len(jpeg_data)))
+
+    def run_queued_cycle(self, due_only: bool = False):
+        """News cycle on the durable job queue: feed, image and thumbnail jobs with retries"""
+        print("🇳🇬 Starting queued Nigerian News Cycle...")
+        self.create_fallback_images()
 
-        print("📡 Fetching news with images from Nigerian sources...")
+        rss_feeds = self.scheduler.due_feeds(self.rss_feeds) if due_only else self.rss_feeds
+        self.metrics.start_cycle()
+        cycle_start = time.perf_counter()
         for rss_url, category in rss_feeds:
-            articles = self.fetch_news_from_rss(rss_url, category)
-            all_articles.extend(articles)
-            time.sleep(0.5)  # Be nice to servers
-
-        if all_articles:
-            saved_ids = self.save_articles(all_articles)
-            print(f"\n✅ Nigerian News Cycle with Images Completed! 🇳🇬📸")
+            self.job_queue.enqueue('feed_fetch', {'url': rss_url, 'category': category},
+                                   dedupe_key=f"feed:{rss_url}", max_attempts=3)
+
+        runner = JobRunner(self.job_queue, {
+            'feed_fetch': self.handle_feed_fetch_job,
+            'image_download': self.handle_image_download_job,
+            'thumbnail_build': self.handle_thumbnail_build_job,
+        }, workers=self.job_workers, poll_interval=0.2)
+        runner.run(drain=True)
+        self.metrics.record('cycle.feeds', len(rss_feeds))
+        self.metrics.record('cycle.seconds', time.perf_counter() - cycle_start)
+        self.metrics.flush()
+        print(f"✅ Queued cycle finished, jobs: {self.job_queue.counts()}")
 
     def get_recent_articles(self, limit: int = 10) -> List[Dict]:
         """Get recent articles with image paths"""
-        conn = sqlite3.connect(self.db_name)
+        conn = news_db.connect(self.db_name)
         cursor = conn.cursor()
 
         cursor.execute("""
             SELECT id, title, description, url, published_date, source, category, 
                    local_image_path, posted_to_social
-            FROM articles ORDER BY created_at DESC LIMIT ?
+            FROM articles ORDER BY created_epoch DESC LIMIT ?
         """, (limit,))
 
         articles = []
@@ -341,4 +940,8 @@ if __name__ == "__main__":
     print("=" * 60)
 
     app = NigerianNewsBlogWithImages()
-    app.run_nigerian_news_cycle()
+    app.use_fast_parser = '--fast-parser' in sys.argv
+    if '--queue' in sys.argv:
+        app.run_queued_cycle(due_only='--due' in sys.argv)
+    else:
+        app.run_nigerian_news_cycle(concurrent='--serial' not in sys.argv, due_only='--due' in sys.argv)
@@ -1,49 +1,38 @@
 from flask import Flask, render_template_string
-import sqlite3
 import os
 
+import migrations
+import news_db
+
 app = Flask(__name__)
+db = news_db.ConnectionPool('nigerian_news_blog.db')
 
 def create_sample_database():
     """Create database with sample articles if it doesn't exist"""
     try:
-        conn = sqlite3.connect('nigerian_news_blog.db')
-        cursor = conn.cursor()
-        
-        # Create table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS articles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                url TEXT UNIQUE NOT NULL,
-                published_date TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                source TEXT,
-                category TEXT DEFAULT 'nigeria',
-                local_image_path TEXT,
-                posted_to_social BOOLEAN DEFAULT FALSE
-            )
-        ''')
-        
-        # Add sample articles
-        sample_articles = [
-            ("Breaking: Nigerian Economy Shows Growth in Q4 2025", "Nigeria's GDP demonstrates remarkable resilience with positive indicators across technology, agriculture, and oil sectors.", "https://naijanews.com/economy-1", "2025-09-29 16:00:00", "Nigerian News Hub", "nigeria"),
-            ("Super Eagles Qualify for AFCON 2026 Finals", "Nigerian national team secures historic victory against Ghana in spectacular match at National Stadium.", "https://sports.ng/eagles-1", "2025-09-29 15:30:00", "Nigerian Sports", "sports"),
-            ("Nollywood Film Wins at Cannes Festival", "Nigerian film industry receives international recognition with prestigious award for outstanding production.", "https://entertainment.ng/nollywood-1", "2025-09-29 15:00:00", "Entertainment Hub", "entertainment"),
-            ("Lagos Infrastructure Development Milestone", "Major road projects in Lagos show significant progress with new highway sections opening to public.", "https://infrastructure.ng/lagos-1", "2025-09-29 14:30:00", "Nigerian News Hub", "nigeria"),
-            ("Nigerian Startup Raises $50M in Series B", "Tech company based in Abuja secures major funding from international investors for African expansion.", "https://tech.ng/startup-1", "2025-09-29 14:00:00", "Tech News Nigeria", "nigeria")
-        ]
-        
-        for title, desc, url, pub_date, source, category in sample_articles:
-            cursor.execute("""
-                INSERT OR IGNORE INTO articles 
-                (title, description, url, published_date, source, category, local_image_path)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (title, desc, url, pub_date, source, category, 'images/fallbacks/news_default.jpg'))
-        
-        conn.commit()
-        conn.close()
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Create or upgrade the articles table
+            migrations.migrate(cursor)
+            
+            # Add sample articles
+            sample_articles = [
+                ("Breaking: Nigerian Economy Shows Growth in Q4 2025", "Nigeria's GDP demonstrates remarkable resilience with positive indicators across technology, agriculture, and oil sectors.", "https://naijanews.com/economy-1", "2025-09-29 16:00:00", "Nigerian News Hub", "nigeria"),
+                ("Super Eagles Qualify for AFCON 2026 Finals", "Nigerian national team secures historic victory against Ghana in spectacular match at National Stadium.", "https://sports.ng/eagles-1", "2025-09-29 15:30:00", "Nigerian Sports", "sports"),
+                ("Nollywood Film Wins at Cannes Festival", "Nigerian film industry receives international recognition with prestigious award for outstanding production.", "https://entertainment.ng/nollywood-1", "2025-09-29 15:00:00", "Entertainment Hub", "entertainment"),
+                ("Lagos Infrastructure Development Milestone", "Major road projects in Lagos show significant progress with new highway sections opening to public.", "https://infrastructure.ng/lagos-1", "2025-09-29 14:30:00", "Nigerian News Hub", "nigeria"),
+                ("Nigerian Startup Raises $50M in Series B", "Tech company based in Abuja secures major funding from international investors for African expansion.", "https://tech.ng/startup-1", "2025-09-29 14:00:00", "Tech News Nigeria", "nigeria")
+            ]
+            
+            for title, desc, url, pub_date, source, category in sample_articles:
+                cursor.execute("""
+                    INSERT OR IGNORE INTO articles 
+                    (title, description, url, published_date, source, category, local_image_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (title, desc, url, pub_date, source, category, 'images/fallbacks/news_default.jpg'))
+            
+            conn.commit()
         return True
     except Exception as e:
         print(f"Database error: {e}")
@@ -56,11 +45,10 @@ def home():
         create_sample_database()
         
         # Get articles
-        conn = sqlite3.connect('nigerian_news_blog.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT title, description, source, category, published_date FROM articles ORDER BY published_date DESC LIMIT 10")
-        articles = cursor.fetchall()
-        conn.close()
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(news_db.NEWEST_PUBLISHED_SQL)
+            articles = cursor.fetchall()
         
         # Generate HTML with real articles
         articles_html = ""